@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+
+Usage:
+python benchmark.py highlighter [blocks]
+python benchmark.py keys [keystrokes] [blocks]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from PyQt4 import QtGui, QtCore
+from PyQt4.QtCore import QRegExp, QString
+from libquiedit import markdown_syntax
+
+def document(n_blocks):
+
+	"""
+	Creates a test document by repeating the readme.
+
+	Arguments:
+	n_blocks	--	The number of blocks.
+
+	Returns:
+	A list of unicode strings, one for each block.
+	"""
+
+	lines = open(u'readme.src.md').read().decode(u'utf-8').split(u'\n')
+	return (lines * (n_blocks / len(lines) + 1))[:n_blocks]
+
+def bench_highlighter(n_blocks=100000):
+
+	"""
+	Compares the blocks/second of the legacy highlighter rules with the
+	single-pass scanner. Formats are not applied, because this requires a
+	running QApplication.
+
+	Keyword arguments:
+	n_blocks	--	The number of blocks to highlight. (default=100000)
+	"""
+
+	blocks = [QString(line) for line in document(n_blocks)]
+	rules = [(QRegExp(pat), nth) for (pat, nth, fmt) in \
+		markdown_syntax.legacy_rules]
+
+	t0 = time.time()
+	for text in blocks:
+		for expression, nth in rules:
+			index = expression.indexIn(text, 0)
+			while index >= 0:
+				index = expression.pos(nth)
+				length = expression.cap(nth).length()
+				index = expression.indexIn(text, index + length)
+	t_legacy = time.time() - t0
+
+	t0 = time.time()
+	state = markdown_syntax.STATE_NORMAL
+	for text in blocks:
+		spans, state = markdown_syntax.scan(unicode(text), state)
+	t_scanner = time.time() - t0
+
+	print(u'legacy:  %10.0f blocks/s' % (n_blocks / t_legacy))
+	print(u'scanner: %10.0f blocks/s' % (n_blocks / t_scanner))
+
+def keystrokes(n_keys):
+
+	"""
+	Creates a keystroke stream by typing the readme, with a typo that is
+	corrected every 50 characters and some cursor movement at the end of each
+	line.
+
+	Arguments:
+	n_keys		--	The number of keystrokes.
+
+	Returns:
+	A list of (key name, Qt key code, text) tuples.
+	"""
+
+	keys = []
+	for i, char in enumerate(u'\n'.join(document(n_keys))):
+		if char == u'\n':
+			keys += [(u'Left', QtCore.Qt.Key_Left, u''),
+				(u'Right', QtCore.Qt.Key_Right, u''),
+				(u'Return', QtCore.Qt.Key_Return, u'\r')]
+			continue
+		if i % 50 == 49:
+			keys += [(u'character', QtCore.Qt.Key_X, u'x'),
+				(u'Backspace', QtCore.Qt.Key_Backspace, u'')]
+		if char == u' ':
+			keys.append((u'Space', QtCore.Qt.Key_Space, char))
+		elif ord(char) < 256:
+			keys.append((u'character', ord(char.upper()), char))
+		else:
+			keys.append((u'character', QtCore.Qt.Key_unknown, char))
+		if len(keys) >= n_keys:
+			break
+	return keys[:n_keys]
+
+def percentile(values, p):
+
+	"""
+	Gives a percentile of a list of values.
+
+	Arguments:
+	values		--	A non-empty list of numbers.
+	p			--	The percentile, between 0 and 100.
+
+	Returns:
+	The percentile value.
+	"""
+
+	values = sorted(values)
+	return values[min(len(values) - 1, int(len(values) * p / 100.))]
+
+def bench_keys(n_keys=2000, n_blocks=10000):
+
+	"""
+	Replays a keystroke stream in the editor, and reports the p50 and p99
+	latency for each kind of key. The latency includes the processing of the
+	events that are queued by the keystroke, such as the spellchecking of the
+	current word. The editor is started with a temporary home folder, so that
+	the user's settings and journal are left alone.
+
+	Keyword arguments:
+	n_keys		--	The number of keystrokes. (default=2000)
+	n_blocks	--	The number of blocks in the document that is edited.
+					(default=10000)
+	"""
+
+	home = tempfile.mkdtemp(prefix=u'quiedit-benchmark-')
+	os.environ[u'HOME'] = os.environ[u'USERPROFILE'] = home
+	os.environ[u'XDG_CONFIG_HOME'] = os.path.join(home, u'.config')
+	QtCore.QSettings.setPath(QtCore.QSettings.NativeFormat, \
+		QtCore.QSettings.UserScope, os.path.join(home, u'.config'))
+	from libquiedit import qtquiedit
+	app = QtGui.QApplication(sys.argv)
+	try:
+		window = qtquiedit.qtquiedit()
+		editor = window.editor
+		editor.setPlainText(u'\n'.join(document(n_blocks)))
+		editor.moveCursor(QtGui.QTextCursor.End)
+		app.processEvents()
+		latencies = {}
+		for name, key, text in keystrokes(n_keys):
+			event = QtGui.QKeyEvent(QtCore.QEvent.KeyPress, key, \
+				QtCore.Qt.NoModifier, text)
+			t0 = time.time()
+			app.sendEvent(editor, event)
+			app.processEvents()
+			latencies.setdefault(name, []).append(1000 * (time.time() - t0))
+		window.close()
+	finally:
+		shutil.rmtree(home, ignore_errors=True)
+	print(u'%-10s %8s %8s %8s' % (u'key', u'n', u'p50 ms', u'p99 ms'))
+	for name, values in sorted(latencies.items()):
+		print(u'%-10s %8d %8.2f %8.2f' % (name, len(values), \
+			percentile(values, 50), percentile(values, 99)))
+
+benchmarks = {
+	u'highlighter': bench_highlighter,
+	u'keys': bench_keys,
+	}
+
+if __name__ == u'__main__':
+
+	if len(sys.argv) < 2 or sys.argv[1] not in benchmarks:
+		print(__doc__[__doc__.index(u'Usage:'):].strip())
+		sys.exit(1)
+	benchmarks[sys.argv[1]](*[int(arg) for arg in sys.argv[2:]])
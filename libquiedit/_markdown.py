@@ -17,13 +17,21 @@ You should have received a copy of the GNU General Public License
 along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-from libquiedit import quieditor
+from libquiedit import quieditor, markdown_worker, markdown_syntax
 from PyQt4 import QtGui, QtCore
+import os
+import sys
+import json
 import re
+import time
 
 class _markdown(quieditor.quieditor):
 
-	"""Displays a Markdown preview"""
+	"""
+	Displays a Markdown preview. The document is split into sections, and the
+	HTML of each section is cached, so that only changed sections need to be
+	rendered again.
+	"""
 
 	def __init__(self, parent):
 
@@ -35,24 +43,128 @@ class _markdown(quieditor.quieditor):
 		"""
 
 		super(_markdown, self).__init__(parent, readonly=True)
+		# The revision of the editor text that is currently shown, and the
+		# revision that is being rendered.
+		self.shown_revision = None
+		self.process = None
+		self.process_revision = None
+		# Maps the hashes of the section sources onto the HTML of their body,
+		# and the head and tail of the last rendered HTML document, which are
+		# shared by all sections.
+		self.section_cache = {}
+		self.html_head = u''
+		self.html_tail = u''
 
 	def refresh(self):
 
-		"""Update the contents with the markdown generated syntax"""
+		"""
+		Update the contents with the markdown generated syntax. Changed sections
+		are rendered in a separate process, and rendering is skipped altogether
+		if the text has not changed since the last time.
+		"""
+
+		# Partially loaded files are not rendered
+		if self.quiedit.editor.loading:
+			return
+		revision = self.quiedit.editor.text_revision
+		if revision == self.shown_revision:
+			return
+		if self.process != None:
+			if revision == self.process_revision:
+				return
+			self.cancel()
+		sections = markdown_syntax.sections(unicode( \
+			self.quiedit.editor.toPlainText()))
+		self.section_hashes = [hash(section) for section in sections]
+		self.process_revision = revision
+		changed = [section for section in sections \
+			if hash(section) not in self.section_cache]
+		if len(changed) == 0:
+			self.show_sections()
+			return
+		if self.quiedit.debug:
+			print(u'_markdown.refresh(): rendering %d of %d sections' \
+				% (len(changed), len(sections)))
+		# A frozen (py2exe) application cannot run the worker script
+		if getattr(sys, u'frozen', False):
+			self.cache_sections(changed, markdown_worker.render_sections( \
+				changed))
+			self.show_sections()
+			return
+		if self.shown_revision == None:
+			self.setHtml(u'Rendering preview ...')
+		self.changed_sections = changed
+		self.process = QtCore.QProcess(self)
+		self.process.finished.connect(self.rendered)
+		self.process.start(sys.executable, [os.path.splitext( \
+			markdown_worker.__file__)[0] + u'.py'])
+		self.process.write(json.dumps(changed))
+		self.process.closeWriteChannel()
+
+	def cache_sections(self, sources, html):
+
+		"""
+		Adds rendered sections to the cache.
+
+		Arguments:
+		sources		--	A list of Markdown sources.
+		html		--	A list of [head, body, tail] lists for the sources.
+		"""
+
+		for source, (head, body, tail) in zip(sources, html):
+			self.section_cache[hash(source)] = body
+			self.html_head = head
+			self.html_tail = tail
+
+	def show_sections(self):
+
+		"""
+		Shows the HTML of all sections, and forgets sections that are no longer
+		part of the document. The scroll position is preserved.
+		"""
+
+		self.section_cache = dict((h, self.section_cache[h]) \
+			for h in self.section_hashes)
+		pos = self.verticalScrollBar().value()
+		self.setHtml(self.html_head + u''.join(self.section_cache[h] \
+			for h in self.section_hashes) + self.html_tail)
+		self.verticalScrollBar().setValue(pos)
+		self.shown_revision = self.process_revision
+		if self.quiedit.debug and self.quiedit.live_preview and \
+			self.quiedit.last_edit_time != None:
+			print(u'_markdown.show_sections(): %.0f ms since last keystroke' \
+				% (1000 * (time.time() - self.quiedit.last_edit_time)))
+
+	def cancel(self):
+
+		"""Stops rendering, if a render is in progress."""
 
-		self.setHtml(self.toMarkdown())
+		if self.process == None:
+			return
+		self.process.finished.disconnect(self.rendered)
+		self.process.kill()
+		self.process.waitForFinished()
+		self.process = None
 
-	def toMarkdown(self):
+	def rendered(self, exit_code, exit_status):
 
 		"""
-		Parse the document using Markdown
+		Is called when the worker process has finished.
 
-		Returns:
-		A string with the parsed document
+		Arguments:
+		exit_code	--	The exit code of the worker.
+		exit_status	--	A QProcess.ExitStatus.
 		"""
 
-		try:
-			from academicmarkdown import build
-		except:
-			return u'Please install python-academicmarkdown!'
-		return build.HTML(unicode(self.quiedit.editor.toPlainText()))
+		process = self.process
+		self.process = None
+		if exit_status != QtCore.QProcess.NormalExit or exit_code != 0:
+			self.quiedit.set_status(u'Failed to render preview')
+			if self.quiedit.debug:
+				print(u'_markdown.rendered(): %s' % str( \
+					process.readAllStandardError()).decode(u'utf-8', \
+					u'ignore'))
+			return
+		self.cache_sections(self.changed_sections, json.loads(str( \
+			process.readAllStandardOutput())))
+		self.show_sections()
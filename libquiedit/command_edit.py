@@ -17,8 +17,23 @@ You should have received a copy of the GNU General Public License
 along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import yaml
 from PyQt4 import QtGui, QtCore
+from libquiedit import resource_cache
+
+def compile_snippets(path):
+
+	"""
+	Parses the snippets file.
+
+	Arguments:
+	path	--	The path to the snippets file.
+
+	Returns:
+	A dictionary that maps snippet names onto snippets.
+	"""
+
+	import yaml
+	return yaml.load(open(path).read())
 
 class command_edit(QtGui.QLineEdit):
 
@@ -35,19 +50,51 @@ class command_edit(QtGui.QLineEdit):
 
 		super(command_edit, self).__init__(parent)
 		self.quiedit = parent
-		self.snippets = yaml.load(open(self.quiedit.get_resource( \
-			u'snippets.yaml')).read())
+		self._snippets = None
 		self.returnPressed.connect(self.execute)
 
+	def snippets(self):
+
+		"""
+		Gets the snippets. These are loaded when they are first used, and
+		through the resource cache, so that PyYAML is rarely needed.
+
+		Returns:
+		A dictionary that maps snippet names onto snippets.
+		"""
+
+		if self._snippets == None:
+			self._snippets = resource_cache.load(u'snippets', \
+				self.quiedit.get_resource(u'snippets.yaml'), compile_snippets)
+		return self._snippets
+
 	def execute(self):
 
-		"""Executes the current command."""
+		"""
+		Executes the current command. The following commands are supported:
+
+		snp [snippet]				--	Inserts a snippet.
+		rep [term] [replacement]	--	Replaces the next match of a term.
+		repall [term] [replacement]	--	Replaces all matches of a term.
+
+		The replacement may contain spaces and may be omitted to remove the
+		term. The search options (case, word, and regex) are respected.
+		"""
 
-		cmd = unicode(self.text()).split()
+		text = unicode(self.text())
+		cmd = text.split()
 		if len(cmd) == 2 and cmd[0] == u'snp':
 			snippet = cmd[1]
-			if snippet in self.snippets:
-				self.quiedit.editor.insertText(self.snippets[snippet])
+			if snippet in self.snippets():
+				self.quiedit.editor.insertText(self.snippets()[snippet])
+		elif len(cmd) >= 2 and cmd[0] in (u'rep', u'repall'):
+			args = text.split(None, 2)
+			if len(args) == 3:
+				replacement = args[2]
+			else:
+				replacement = u''
+			self.quiedit.editor.replace(args[1], replacement, \
+				replace_all=cmd[0] == u'repall')
 		self.clear()
 		self.quiedit.command_box.hide()
 
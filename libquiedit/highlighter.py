@@ -17,12 +17,60 @@ You should have received a copy of the GNU General Public License
 along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import bisect
 from PyQt4.QtCore import QRegExp
-from PyQt4.QtGui import QColor, QTextCharFormat, QFont, QSyntaxHighlighter
+from PyQt4.QtGui import QColor, QTextCharFormat, QFont, QSyntaxHighlighter, \
+	QTextBlockUserData
+from libquiedit import markdown_syntax
 
-class MarkdownHighlighter(QSyntaxHighlighter):
+class block_data(QTextBlockUserData):
 
-	"""Markdown syntax highligher"""
+	"""Information that is attached to each block of text."""
+
+	def __init__(self):
+
+		"""Constructor."""
+
+		super(block_data, self).__init__()
+		# A list of (position, length) tuples of misspelled words, and the hash
+		# of the block text that was checked
+		self.misspelled = []
+		self.checked_hash = None
+		# The dictionary that is used for the block, and the hash of the block
+		# text for which it was guessed
+		self.language = None
+		self.language_hash = None
+		# A list of (position, length, format id) tuples of highlighted spans,
+		# the (text hash, previous block state) that they were computed for,
+		# and the resulting block state
+		self.spans = None
+		self.spans_key = None
+		self.spans_state = 0
+
+def get_block_data(block):
+
+	"""
+	Gets the block data of a block, and attaches new block data if necessary.
+
+	Arguments:
+	block		--	A QTextBlock.
+
+	Returns:
+	A block_data object.
+	"""
+
+	data = block.userData()
+	if data == None:
+		data = block_data()
+		block.setUserData(data)
+	return data
+
+class SpellingHighlighter(QSyntaxHighlighter):
+
+	"""
+	Underlines misspelled words. The spellchecker stores the misspelled words
+	as block data, so that underlining them does not modify the document.
+	"""
 
 	def __init__(self, qtextedit):
 
@@ -30,77 +78,106 @@ class MarkdownHighlighter(QSyntaxHighlighter):
 		Constructor.
 
 		Arguments:
-		qtextedit	--	A QTextEdit object.
+		qtextedit	--	A quieditor object.
 		"""
 
 		self.qtextedit = qtextedit
+		super(SpellingHighlighter, self).__init__(qtextedit)
+		self.spelling_format = self.qtextedit.speller_style()
+
+	def highlight_spelling(self, text):
+
+		"""
+		Underlines the misspelled words of the current block.
+
+		Arguments:
+		text		--	The text of the current block.
+		"""
+
+		if not self.qtextedit.quiedit.speller_enabled:
+			return
+		data = self.currentBlockUserData()
+		# Blocks without data have not been checked yet.
+		if data == None or data.checked_hash == None:
+			return
+		text = unicode(text)
+		# Blocks that have been edited since they were last checked are checked
+		# again right away.
+		if data.checked_hash != hash(text):
+			data.misspelled = self.qtextedit.spelling_ranges(text, \
+				self.qtextedit.block_language(data, text))
+			data.checked_hash = hash(text)
+		# The format only changes at the boundaries of the highlighted spans,
+		# so the underline is merged once for each part of a word that lies
+		# between two boundaries.
+		bounds = []
+		if data.spans != None:
+			bounds = sorted(set([index for index, length, fmt in data.spans] \
+				+ [index + length for index, length, fmt in data.spans]))
+		for pos, length in data.misspelled:
+			end = pos + length
+			cuts = [pos] + bounds[bisect.bisect_right(bounds, pos): \
+				bisect.bisect_left(bounds, end)] + [end]
+			for start, stop in zip(cuts, cuts[1:]):
+				# Merge the underline with the existing format, so that the
+				# syntax highlighting is preserved. MarkdownHighlighter
+				# overrides format(), so call the QSyntaxHighlighter version.
+				fmt = QSyntaxHighlighter.format(self, start)
+				fmt.merge(self.spelling_format)
+				self.setFormat(start, stop - start, fmt)
+
+	def highlightBlock(self, text):
+
+		"""
+		Apply highlighting to the given block of text.
+
+		Arguments:
+		text		--	The text text block to process.
+		"""
+
+		self.highlight_spelling(text)
+
+class MarkdownHighlighter(SpellingHighlighter):
+
+	"""Markdown syntax highligher"""
+
+	def __init__(self, qtextedit):
+
+		"""
+		Constructor.
+
+		Arguments:
+		qtextedit	--	A quieditor object.
+		"""
+
 		super(MarkdownHighlighter, self).__init__(qtextedit)
+		self.cache_hits = 0
+		self.cache_misses = 0
+
+		theme = self.qtextedit.quiedit._theme.theme
+		self.formats = {
+			u'h1': self.format(color=theme[u'h1_color'], bold=True),
+			u'h2': self.format(color=theme[u'h2_color'], italic=True),
+			u'emphasis': self.format(italic=True),
+			u'strong': self.format(bold=True),
+			u'citation': self.format(color=theme[u'citation_color']),
+			u'ref': self.format(color=theme[u'ref_color']),
+			u'link': self.format(color=theme[u'link_color']),
+			u'code': self.format(family=theme[u'code_font']),
+			u'list': self.format(color=theme[u'list_color']),
+			u'quote': self.format(color=theme[u'quote_color']),
+			u'yaml': self.format(color=theme[u'ref_color']),
+			u'keyword': self.format(color=theme[u'highlight_foreground'], \
+				background=theme[u'highlight_background']),
+			}
 
-		keywords = [u'TODO', u'NOTE', u'HIGHLIGHT', u'REF']
-
-		rules = [
-			# Header 1 strings: # Title
-			(ur'^#[^#\n]*', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'h1_color'], \
-				bold=True)),
-			# Header 2 strings: ## Title
-			(ur'^##[^\n]*', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'h2_color'], italic=True)),
-			# Emphasize: *emphasize*
-			(ur'\*(\S[^\*]+\S|[^\*\s]{1,2})\*(?!\w)', 0, self.format(italic=True)),
-			# Strong: **strong**
-			(ur'\*\*(\S[^\*]+\S|[^\*\s]{1,2})\*\*(?!\w)', 0, self.format(bold=True)),
-			# Emphasize: _emphasize_
-			(ur'_(\S[^\*\_]+\S|[^\*\_\s]{1,2})_(?!\w)', 0, self.format(italic=True)),
-			# Strong: __strong__
-			(ur'__(\S[^\*\_]+\S|[^\*\_\s]{1,2})__(?!\w)', 0, self.format(bold=True)),
-			# Citation: '@Mathôt2013'
-			(ur'@[\w\+]+', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'citation_color'])),
-			# Academic markdown refs: '%Figure', '%Figure::a', 'Figure:a,b'
-			(ur'%[\w]+(::[\w,]+)*', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'ref_color'])),
-			# Normal link style: [link](url)
-			(ur'\[[^@%\]]+\]\(\S+\)', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'link_color'])),
-			# Shorthand link style: [link]
-			(ur'\[[^@%\]]+\]', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'link_color'])),
-			# Direct links: <url>
-			(ur'<[^>]+>', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'link_color'])),
-			# Code: indented by a single tab at the start of a sentence
-			(ur'^\t.+', 0, self.format(family= \
-				self.qtextedit.quiedit._theme.theme[u'code_font'])),
-			# Code: `inline style`
-			(ur'`[^`]+`', 0, self.format(family= \
-				self.qtextedit.quiedit._theme.theme[u'code_font'])),
-			# Lists, starting with '- ' or '1. '
-			(ur'^(-|\d+\.)\s', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'list_color'])),
-			# Quotations, starting with '> '
-			(ur'^>\s.+$', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'quote_color'])),
-			# Academic Markdown YAML blocks
-			(ur'^%--', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'ref_color'])),
-			(ur'^--%', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'ref_color'])),
-			(ur'^\s*\w+:', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'ref_color'])),
-			# Inline YAML
-			(ur'%--[^\_]*--%', 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'ref_color'])),
-			# Highlighted keywords
-			(ur'\b(%s)\b' % u'|'.join(keywords), 0, self.format(color= \
-				self.qtextedit.quiedit._theme.theme[u'highlight_foreground'], \
-				background=self.qtextedit.quiedit._theme.theme[ \
-				u'highlight_background'])),
-			]
-
-		# Build a QRegExp for each pattern
-		self.rules = [(QRegExp(pat), index, fmt)
-			for (pat, index, fmt) in rules]
+		# The legacy engine applies a QRegExp for each rule, whereas the scanner
+		# finds all constructs in a single pass.
+		if self.qtextedit.quiedit.highlighter_engine == u'legacy':
+			self.rules = [(QRegExp(pat), index, fmt)
+				for (pat, index, fmt) in markdown_syntax.legacy_rules]
+		else:
+			self.rules = None
 
 	def format(self, family=None, color=None, background=None, bold=None, \
 		italic=None):
@@ -142,21 +219,77 @@ class MarkdownHighlighter(QSyntaxHighlighter):
 				_format.setFontItalic(False)
 		return _format
 
-	def highlightBlock(self, text):
+	def spans(self, text, state):
 
 		"""
-		Apply syntax highlighting to the given block of text.
+		Finds the highlighted spans in a block of text.
 
 		Arguments:
-		text		--	The text text block to process.
+		text		--	The text of the block as a QString.
+		state		--	The state in which the block starts.
+
+		Returns:
+		A (spans, state) tuple, where spans is a list of (position, length,
+		format id) tuples and state is the state of the block. The legacy
+		engine does not track multi-line constructs.
 		"""
 
-		for expression, nth, format in self.rules:
+		if self.rules == None:
+			return markdown_syntax.scan(unicode(text), state)
+		spans = []
+		for expression, nth, fmt in self.rules:
 			index = expression.indexIn(text, 0)
 			while index >= 0:
 				# We actually want the index of the nth match
 				index = expression.pos(nth)
 				length = expression.cap(nth).length()
-				self.setFormat(index, length, format)
+				spans.append((index, length, fmt))
 				index = expression.indexIn(text, index + length)
-		self.setCurrentBlockState(0)
+		return spans, markdown_syntax.STATE_NORMAL
+
+	def cache_info(self):
+
+		"""
+		Gives statistics about the span cache.
+
+		Returns:
+		A (hits, misses) tuple.
+		"""
+
+		return self.cache_hits, self.cache_misses
+
+	def highlightBlock(self, text):
+
+		"""
+		Apply syntax highlighting to the given block of text. The spans are
+		cached in the block data, so that unchanged blocks are not parsed again
+		when they are rehighlighted.
+
+		Arguments:
+		text		--	The text text block to process.
+		"""
+
+		# Files are highlighted in batches once they have been loaded. Until
+		# then, the blocks get the normal state, so that highlighting a block
+		# does not trigger highlighting of the rest of the document.
+		if self.qtextedit.loading:
+			self.setCurrentBlockState(markdown_syntax.STATE_NORMAL)
+			return
+		data = self.currentBlockUserData()
+		if data == None:
+			data = block_data()
+			self.setCurrentBlockUserData(data)
+		# The first block has no previous state
+		state = max(markdown_syntax.STATE_NORMAL, self.previousBlockState())
+		key = hash(unicode(text)), state
+		if data.spans_key == key:
+			self.cache_hits += 1
+		else:
+			self.cache_misses += 1
+			data.spans, data.spans_state = self.spans(text, state)
+			data.spans_key = key
+		for index, length, fmt in data.spans:
+			self.setFormat(index, length, self.formats[fmt])
+		# Qt only rehighlights the next block if the state has changed
+		self.setCurrentBlockState(data.spans_state)
+		self.highlight_spelling(text)
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import hashlib
+from PyQt4 import QtGui, QtCore
+from libquiedit import saver
+
+# The last line of a journal that was closed when the application shut down
+closed_marker = b'"closed"'
+
+def fingerprint(text):
+
+	"""
+	Gives a fingerprint of a text, which is used to verify that a journal
+	belongs to the file that it is replayed on. Saved files always end with a
+	newline, so a missing final newline is ignored.
+
+	Arguments:
+	text		--	A unicode string.
+
+	Returns:
+	A hexadecimal md5 digest.
+	"""
+
+	if not text.endswith(u'\n'):
+		text += u'\n'
+	return hashlib.md5(text.encode(u'utf-8')).hexdigest()
+
+def common_prefix(a, b):
+
+	"""
+	Gives the length of the common prefix of two strings. This uses a binary
+	search over slice comparisons, which is much faster than comparing
+	characters one at a time for long strings.
+
+	Arguments:
+	a			--	A unicode string.
+	b			--	A unicode string.
+
+	Returns:
+	The length of the common prefix.
+	"""
+
+	lo = 0
+	hi = min(len(a), len(b))
+	while lo < hi:
+		mid = (lo + hi + 1) / 2
+		if a[lo:mid] == b[lo:mid]:
+			lo = mid
+		else:
+			hi = mid - 1
+	return lo
+
+def apply_edits(text, entries):
+
+	"""
+	Applies journal entries to a text. Positions are in UTF-16 code units,
+	because that is how Qt counts, so the edits are applied to the UTF-16
+	encoded text. This gives the same result on narrow and wide Python builds.
+
+	Arguments:
+	text		--	A unicode string.
+	entries		--	An iterable of journal lines.
+
+	Returns:
+	A (text, number of applied edits) tuple.
+	"""
+
+	units = text.encode(u'utf-16-le')
+	n = 0
+	for entry in entries:
+		# The last line may be incomplete if the application crashed
+		try:
+			pos, removed, added = json.loads(entry)
+		except ValueError:
+			break
+		units = units[:2 * pos] + added.encode(u'utf-16-le') + \
+			units[2 * (pos + removed):]
+		n += 1
+	return units.decode(u'utf-16-le'), n
+
+def difference(old, new):
+
+	"""
+	Describes the difference between two texts as a single edit. Positions are
+	in UTF-16 code units, and surrogate pairs are never split.
+
+	Arguments:
+	old			--	A unicode string.
+	new			--	A unicode string.
+
+	Returns:
+	A (position, removed, added text) tuple.
+	"""
+
+	a = old.encode(u'utf-16-le')
+	b = new.encode(u'utf-16-le')
+	prefix = common_prefix(a, b) / 2
+	suffix = common_prefix(a[2 * prefix:][::-1], b[2 * prefix:][::-1]) / 2
+	# The high byte of a unit tells whether it is a high (D8-DB) or low (DC-DF)
+	# surrogate
+	if prefix > 0 and ord(a[2 * prefix - 1]) & 0xFC == 0xD8:
+		prefix -= 1
+	if suffix > 0 and ord(a[len(a) - 2 * suffix + 1]) & 0xFC == 0xDC:
+		suffix -= 1
+	added = b[2 * prefix:len(b) - 2 * suffix].decode(u'utf-16-le')
+	return prefix, len(a) / 2 - prefix - suffix, added
+
+class journal(QtCore.QObject):
+
+	"""
+	An append-only journal of all edits since the file was last saved, so that
+	unsaved changes can be recovered after a crash. The first line is a header
+	that identifies the file that the edits apply to, and optionally contains a
+	compacted copy of the text. Each following line is a (position, removed,
+	added text) edit.
+	"""
+
+	def __init__(self, quiedit):
+
+		"""
+		Constructor.
+
+		Arguments:
+		quiedit		--	A qtquiedit instance.
+		"""
+
+		super(journal, self).__init__(quiedit)
+		self.quiedit = quiedit
+		self.editor = quiedit.editor
+		self.path = quiedit.journal_file()
+		self.pending = []
+		self.n_entries = 0
+		self.header = None
+		# Increased whenever a new journal is started for another text, so
+		# that a save that finishes afterwards does not rebase the journal
+		self.generation = 0
+		# Pending edits are flushed when the user pauses
+		self.timer = QtCore.QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(quiedit.journal_interval)
+		self.timer.timeout.connect(self.flush)
+		self.editor.document().contentsChange.connect(self.record)
+
+	def record(self, pos, removed, added):
+
+		"""
+		Records an edit.
+
+		Arguments:
+		pos			--	The position of the change.
+		removed		--	The number of removed characters.
+		added		--	The number of added characters.
+		"""
+
+		# Files that are being loaded are not edited, and a journal without a
+		# header has not been started yet.
+		if self.editor.loading or self.header == None:
+			return
+		# Positions are in UTF-16 code units. A change that includes the final
+		# paragraph separator, such as replacing the entire document, runs one
+		# past the last position that can be selected.
+		document = self.editor.document()
+		end = min(pos + added, document.characterCount() - 1)
+		removed = max(0, removed - (pos + added - end))
+		cursor = QtGui.QTextCursor(document)
+		cursor.setPosition(min(pos, end))
+		cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+		# Qt uses paragraph separators instead of newlines
+		text = unicode(cursor.selectedText()).replace(u'\u2029', u'\n')
+		self.pending.append(json.dumps([pos, removed, text]))
+		self.timer.start()
+
+	def flush(self):
+
+		"""Appends the pending edits to the journal on disk."""
+
+		if len(self.pending) == 0:
+			return
+		self.n_entries += len(self.pending)
+		if self.n_entries > self.quiedit.journal_compact_size:
+			self.compact()
+			return
+		with open(self.path, u'ab') as f:
+			f.write(b''.join(entry + b'\n' for entry in self.pending))
+			f.flush()
+			os.fsync(f.fileno())
+		self.pending = []
+
+	def compact(self):
+
+		"""
+		Replaces all edits by a copy of the current text, so that the journal
+		does not keep on growing.
+		"""
+
+		self.header[u'text'] = unicode(self.editor.toPlainText())
+		saver.write_atomic(self.path, json.dumps(self.header) + b'\n')
+		self.pending = []
+		self.n_entries = 0
+		if self.quiedit.debug:
+			print(u'journal.compact(): compacted %s' % self.path)
+
+	def reset(self, path, text):
+
+		"""
+		Starts a new journal. This should be called whenever the text matches
+		the file on disk, that is, after loading and when saving.
+
+		Arguments:
+		path		--	The file that is being edited, or None.
+		text		--	The text of the file.
+		"""
+
+		self.timer.stop()
+		self.generation += 1
+		self.header = {u'path': path, u'base': fingerprint(text)}
+		saver.write_atomic(self.path, json.dumps(self.header) + b'\n')
+		self.pending = []
+		self.n_entries = 0
+
+	def rebase(self, path, text, generation):
+
+		"""
+		Starts a new journal for a text that has been saved. The document may
+		have been edited while it was being saved, in which case these edits
+		are carried over into the new journal as a single edit. Nothing happens
+		if a new journal has been started since the save started, for example
+		because another file has been opened in the meantime.
+
+		Arguments:
+		path		--	The file that has been saved.
+		text		--	The text that has been written to the file.
+		generation	--	The generation of the journal when the save started.
+		"""
+
+		if generation != self.generation:
+			if self.quiedit.debug:
+				print(u'journal.rebase(): journal has been reset, not rebasing')
+			return
+		self.reset(path, text)
+		# The journal still describes the same document
+		self.generation = generation
+		current = unicode(self.editor.toPlainText())
+		if current == text:
+			return
+		self.pending.append(json.dumps(list(difference(text, current))))
+		self.flush()
+
+	def close(self):
+
+		"""
+		Marks the journal as closed, when the application shuts down cleanly.
+		The edits in a closed journal are not recovered.
+		"""
+
+		self.flush()
+		with open(self.path, u'ab') as f:
+			f.write(closed_marker + b'\n')
+			f.flush()
+			os.fsync(f.fileno())
+
+	def recover(self, path, current):
+
+		"""
+		Gets the text that the previous journal describes, if the application
+		did not shut down cleanly and the journal belongs to the file that has
+		just been loaded.
+
+		Arguments:
+		path		--	The file that has been loaded, or None.
+		current		--	The text of the file that has been loaded.
+
+		Returns:
+		A (text, number of edits) tuple, or None if there is nothing to
+		recover.
+		"""
+
+		try:
+			lines = open(self.path, u'rb').read().rstrip(b'\n').split(b'\n')
+			header = json.loads(lines[0])
+		except (IOError, ValueError):
+			return None
+		if lines[-1] == closed_marker or header.get(u'path') != path or \
+			header.get(u'base') != fingerprint(current):
+			return None
+		text, n = apply_edits(header.get(u'text', current), lines[1:])
+		if text == current:
+			return None
+		return text, n
+
+	def restore(self, text):
+
+		"""
+		Restores a recovered text. Only the part that differs is replaced, in a
+		single edit, which is recorded in the current journal.
+
+		Arguments:
+		text		--	The recovered text.
+		"""
+
+		current = unicode(self.editor.toPlainText())
+		pos, removed, added = difference(current, text)
+		cursor = QtGui.QTextCursor(self.editor.document())
+		cursor.setPosition(pos)
+		cursor.setPosition(pos + removed, QtGui.QTextCursor.KeepAnchor)
+		cursor.insertText(added)
+		self.flush()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from PyQt4 import QtCore
+from libquiedit import resource_cache
+
+def parse(path):
+
+	"""
+	Parses a keybindings file. Each line has the form 'function = key', where
+	key consists of modifiers and a single key separated by '+', such as
+	'control+shift+s'. Lines that start with '#' are comments.
+
+	Arguments:
+	path		--	The path to the keybindings file.
+
+	Returns:
+	A dictionary that maps function names onto (key, modifiers) tuples.
+	"""
+
+	keybindings = {}
+	for lineno, l in enumerate(open(path)):
+		l = l.strip()
+		if l == u'' or l.startswith(u'#'):
+			continue
+		a = l.split(u'=')
+		if len(a) != 2:
+			print(u'keymap.parse(): syntax error on line %d of %s: %s' \
+				% (lineno + 1, path, l))
+			continue
+		function = a[0].strip()
+		key = None
+		mods = 0
+		for token in a[1].strip().split(u'+'):
+			token = token.strip().capitalize()
+			modifier = getattr(QtCore.Qt, u'%sModifier' % token, None)
+			if modifier != None:
+				mods |= int(modifier)
+				continue
+			code = getattr(QtCore.Qt, u'Key_%s' % token, None)
+			if code == None:
+				print(u'keymap.parse(): unknown key \'%s\' on line %d of %s' \
+					% (token, lineno + 1, path))
+			else:
+				key = int(code)
+		if key == None:
+			print(u'keymap.parse(): no key on line %d of %s' % (lineno + 1, \
+				path))
+			continue
+		keybindings[function] = key, mods
+	return keybindings
+
+def compile_keymap(path):
+
+	"""
+	Parses a keybindings file, and builds a table for looking up functions.
+
+	Arguments:
+	path		--	The path to the keybindings file.
+
+	Returns:
+	A (keybindings, keytable) tuple, where keybindings maps function names
+	onto (key, modifiers) tuples, and keytable maps (key, modifiers) tuples
+	onto function names.
+	"""
+
+	keybindings = parse(path)
+	keytable = {}
+	for function, key in keybindings.items():
+		keytable[key] = function
+	return keybindings, keytable
+
+def load(path):
+
+	"""
+	Loads a keybindings file through the resource cache, so that the file is
+	only parsed again after it has been modified.
+
+	Arguments:
+	path		--	The path to the keybindings file.
+
+	Returns:
+	A (keybindings, keytable) tuple, as returned by compile_keymap(). These
+	dictionaries are shared and should not be modified.
+	"""
+
+	return resource_cache.load(u'keymap', path, compile_keymap)
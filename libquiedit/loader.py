@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import codecs
+from PyQt4 import QtGui, QtCore
+
+def chunks(fd, size, encoding):
+
+	"""
+	Reads and decodes a file in chunks. An incremental decoder takes care of
+	multibyte characters that are split across chunks. A carriage return at the
+	end of a chunk is held back, because it may be the first half of a \\r\\n
+	that is split across chunks, and Qt turns a separate \\r and \\n into two
+	lines.
+
+	Arguments:
+	fd			--	A file opened in binary mode.
+	size		--	The chunk size in bytes.
+	encoding	--	The file encoding.
+
+	Yields:
+	Unicode strings, the last one of which may be empty.
+	"""
+
+	decoder = codecs.getincrementaldecoder(encoding)(u'ignore')
+	held_back = u''
+	while True:
+		data = fd.read(size)
+		text = held_back + decoder.decode(data, final=data == b'')
+		if data == b'':
+			yield text
+			return
+		held_back = u''
+		if text.endswith(u'\r'):
+			text, held_back = text[:-1], u'\r'
+		yield text
+
+class loader(QtCore.QObject):
+
+	"""
+	Loads a file into the editor in chunks, so that the GUI stays responsive
+	while large files are being loaded.
+	"""
+
+	finished = QtCore.pyqtSignal()
+
+	def __init__(self, quiedit, path):
+
+		"""
+		Constructor.
+
+		Arguments:
+		quiedit		--	A qtquiedit instance.
+		path		--	The file to load.
+		"""
+
+		super(loader, self).__init__(quiedit)
+		self.quiedit = quiedit
+		self.editor = quiedit.editor
+		self.path = path
+		self.fd = open(path, u'rb')
+		self.size = max(1, os.path.getsize(path))
+		self.chunks = chunks(self.fd, quiedit.loader_chunk_size, \
+			quiedit.encoding)
+		self.cancelled = False
+
+	def start(self):
+
+		"""
+		Starts loading. The first chunk is loaded right away, so that small
+		files are loaded in one go.
+		"""
+
+		self.editor.cancel_spelling()
+		self.editor.loading = True
+		self.editor.clear()
+		self.editor.setReadOnly(True)
+		# Undo history is not needed while loading, and the highlighter skips
+		# blocks while loading
+		self.editor.document().setUndoRedoEnabled(False)
+		self.cursor = QtGui.QTextCursor(self.editor.document())
+		self.load_chunk()
+
+	def cancel(self):
+
+		"""Stops loading, leaving the editor with what has been loaded."""
+
+		if not self.cancelled:
+			self.cancelled = True
+			self.finish()
+
+	def load_chunk(self):
+
+		"""Reads, decodes and inserts a single chunk."""
+
+		if self.cancelled:
+			return
+		text = next(self.chunks, None)
+		if text == None:
+			self.finish()
+			self.finished.emit()
+			return
+		if text != u'':
+			self.cursor.movePosition(QtGui.QTextCursor.End)
+			self.cursor.insertText(text)
+		self.quiedit.status.setText(u'Loading %s (%d%%)' % ( \
+			os.path.basename(self.path), 100 * self.fd.tell() / self.size))
+		QtCore.QTimer.singleShot(0, self.load_chunk)
+
+	def finish(self):
+
+		"""Restores the editor after loading."""
+
+		self.fd.close()
+		self.editor.document().setUndoRedoEnabled(True)
+		self.editor.setReadOnly(False)
+		self.editor.loading = False
+		# Re-attaching the highlighter would highlight the entire document in
+		# one go
+		self.editor.rehighlight_in_batches()
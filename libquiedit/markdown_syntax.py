@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import re
+
+# Words that are highlighted wherever they occur
+keywords = [u'TODO', u'NOTE', u'HIGHLIGHT', u'REF']
+
+# The rules of the legacy highlighter. Each rule is a (pattern, nth,
+# format id) tuple, and the rules are applied one after the other, so that
+# later rules take precedence over earlier rules.
+legacy_rules = [
+	# Header 1 strings: # Title
+	(ur'^#[^#\n]*', 0, u'h1'),
+	# Header 2 strings: ## Title
+	(ur'^##[^\n]*', 0, u'h2'),
+	# Emphasize: *emphasize*
+	(ur'\*(\S[^\*]+\S|[^\*\s]{1,2})\*(?!\w)', 0, u'emphasis'),
+	# Strong: **strong**
+	(ur'\*\*(\S[^\*]+\S|[^\*\s]{1,2})\*\*(?!\w)', 0, u'strong'),
+	# Emphasize: _emphasize_
+	(ur'_(\S[^\*\_]+\S|[^\*\_\s]{1,2})_(?!\w)', 0, u'emphasis'),
+	# Strong: __strong__
+	(ur'__(\S[^\*\_]+\S|[^\*\_\s]{1,2})__(?!\w)', 0, u'strong'),
+	# Citation: '@Mathôt2013'
+	(ur'@[\w\+]+', 0, u'citation'),
+	# Academic markdown refs: '%Figure', '%Figure::a', 'Figure:a,b'
+	(ur'%[\w]+(::[\w,]+)*', 0, u'ref'),
+	# Normal link style: [link](url)
+	(ur'\[[^@%\]]+\]\(\S+\)', 0, u'link'),
+	# Shorthand link style: [link]
+	(ur'\[[^@%\]]+\]', 0, u'link'),
+	# Direct links: <url>
+	(ur'<[^>]+>', 0, u'link'),
+	# Code: indented by a single tab at the start of a sentence
+	(ur'^\t.+', 0, u'code'),
+	# Code: `inline style`
+	(ur'`[^`]+`', 0, u'code'),
+	# Lists, starting with '- ' or '1. '
+	(ur'^(-|\d+\.)\s', 0, u'list'),
+	# Quotations, starting with '> '
+	(ur'^>\s.+$', 0, u'quote'),
+	# Academic Markdown YAML blocks
+	(ur'^%--', 0, u'yaml'),
+	(ur'^--%', 0, u'yaml'),
+	(ur'^\s*\w+:', 0, u'yaml'),
+	# Inline YAML
+	(ur'%--[^\_]*--%', 0, u'yaml'),
+	# Highlighted keywords
+	(ur'\b(%s)\b' % u'|'.join(keywords), 0, u'keyword'),
+	]
+
+# The block states. Multi-line constructs are tracked by giving each block the
+# state in which the next block starts.
+STATE_NORMAL = 0
+STATE_YAML = 1
+STATE_CODE = 2
+
+# Constructs that can only occur at the start of a line. Only the first
+# matching alternative is used. The group names are format ids.
+line_re = re.compile(ur'''
+	(?P<h2>\#\#.*)
+	|(?P<h1>\#[^\#]*)
+	|(?P<code>\t.+)
+	|(?P<quote>>\s.+)
+	|(?P<list>(?:-|\d+\.)\s)
+	''', re.UNICODE | re.VERBOSE)
+
+# The start and end of Academic Markdown YAML blocks, and the keys within them
+yaml_start_re = re.compile(ur'%--\s*$', re.UNICODE)
+yaml_end_re = re.compile(ur'--%', re.UNICODE)
+yaml_key_re = re.compile(ur'\s*[\w-]+:', re.UNICODE)
+
+# Fenced code blocks
+fence_re = re.compile(ur'(```|~~~)', re.UNICODE)
+
+# Lines that consist entirely of code or quotation are not scanned for
+# inline constructs.
+verbatim = u'code', u'quote'
+
+# Inline constructs. When several alternatives match at the same position, the
+# first one wins, so longer delimiters come before shorter ones.
+inline_re = re.compile(ur'''
+	(?P<yaml>%%--[^_]*--%%)
+	|(?P<code>`[^`]+`)
+	|(?P<strong>
+		\*\*(?:\S[^*]+\S|[^*\s]{1,2})\*\*(?!\w)
+		|__(?:\S[^*_]+\S|[^*_\s]{1,2})__(?!\w))
+	|(?P<emphasis>
+		\*(?:\S[^*]+\S|[^*\s]{1,2})\*(?!\w)
+		|_(?:\S[^*_]+\S|[^*_\s]{1,2})_(?!\w))
+	|(?P<link>
+		\[[^@%%\]]+\]\(\S+\)
+		|\[[^@%%\]]+\]
+		|<[^>]+>)
+	|(?P<citation>@[\w+]+)
+	|(?P<ref>%%\w+(?:::[\w,]+)*)
+	|(?P<keyword>\b(?:%s)\b)
+	''' % u'|'.join(keywords), re.UNICODE | re.VERBOSE)
+
+def scan(text, state=STATE_NORMAL):
+
+	"""
+	Finds all Markdown constructs in a single line of text, in a single
+	left-to-right pass.
+
+	Arguments:
+	text		--	A unicode string.
+
+	Keyword arguments:
+	state		--	The state in which the line starts.
+					(default=STATE_NORMAL)
+
+	Returns:
+	A (spans, state) tuple, where spans is a list of (position, length, format
+	id) tuples, and state is the state in which the next line starts. Later
+	spans take precedence over earlier spans.
+	"""
+
+	# Inside a fenced code block, everything is code until the closing fence
+	if state == STATE_CODE:
+		if fence_re.match(text) != None:
+			state = STATE_NORMAL
+		return [(0, len(text), u'code')], state
+	# Inside a YAML block, only the keys and the closing marker are highlighted
+	if state == STATE_YAML:
+		m = yaml_end_re.match(text)
+		if m != None:
+			return [(0, m.end(), u'yaml')], STATE_NORMAL
+		m = yaml_key_re.match(text)
+		if m != None:
+			return [(0, m.end(), u'yaml')], STATE_YAML
+		return [], STATE_YAML
+	if fence_re.match(text) != None:
+		return [(0, len(text), u'code')], STATE_CODE
+	m = yaml_start_re.match(text)
+	if m != None:
+		return [(0, m.end(), u'yaml')], STATE_YAML
+	spans = []
+	m = line_re.match(text)
+	if m != None:
+		spans.append((0, m.end(), m.lastgroup))
+		if m.lastgroup in verbatim:
+			return spans, STATE_NORMAL
+	for m in inline_re.finditer(text):
+		spans.append((m.start(), m.end() - m.start(), m.lastgroup))
+	return spans, STATE_NORMAL
+
+# Top-level headers, which start a new section of the preview
+section_re = re.compile(ur'##?(?!#)', re.UNICODE)
+
+# Constructs that depend on the rest of the document: front matter and YAML
+# blocks (which provide metadata and number figures and tables), citations
+# (which are collected in a single bibliography), and references.
+context_re = re.compile(ur'^(?:---\s*$|%--)|@[\w+]+|%\w+', \
+	re.UNICODE | re.MULTILINE)
+
+def sections(text):
+
+	"""
+	Splits a document into sections that start with a '#' or '##' header,
+	such that each section can be rendered on its own. Headers inside fenced
+	code blocks and YAML blocks are ignored. Documents that contain
+	constructs that depend on the rest of the document are not split.
+
+	Arguments:
+	text		--	A unicode string.
+
+	Returns:
+	A list of unicode strings, which together make up the document.
+	"""
+
+	if context_re.search(text) != None:
+		return [text]
+	sections = []
+	start = 0
+	pos = 0
+	state = STATE_NORMAL
+	for line in text.split(u'\n'):
+		if state == STATE_CODE:
+			if fence_re.match(line) != None:
+				state = STATE_NORMAL
+		elif state == STATE_YAML:
+			if yaml_end_re.match(line) != None:
+				state = STATE_NORMAL
+		elif fence_re.match(line) != None:
+			state = STATE_CODE
+		elif yaml_start_re.match(line) != None:
+			state = STATE_YAML
+		elif section_re.match(line) != None and pos > start:
+			sections.append(text[start:pos])
+			start = pos
+		pos += len(line) + 1
+	sections.append(text[start:])
+	return sections
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Renders Markdown to HTML in a separate process, so that the editor does not
+# freeze while academicmarkdown (and Pandoc) are working. A JSON list of
+# Markdown sections is read from stdin, and a JSON list with the HTML of each
+# section, split into a [head, body, tail] list, is written to stdout.
+
+import re
+import sys
+import json
+
+# Splits a complete HTML document into the part up to and including <body>,
+# the contents of the body, and the rest
+body_re = re.compile(ur'^(.*<body[^>]*>)(.*)(</body>.*)$', re.DOTALL | \
+	re.IGNORECASE)
+
+def render(text):
+
+	"""
+	Renders Markdown to HTML.
+
+	Arguments:
+	text		--	A unicode string with Markdown source.
+
+	Returns:
+	A unicode string with HTML.
+	"""
+
+	try:
+		from academicmarkdown import build
+	except:
+		return u'Please install python-academicmarkdown!'
+	return build.HTML(text)
+
+def split(html):
+
+	"""
+	Splits rendered HTML into a head, a body, and a tail, so that the bodies of
+	several sections can be combined into a single document.
+
+	Arguments:
+	html		--	A unicode string with HTML.
+
+	Returns:
+	A [head, body, tail] list. If the HTML is not a complete document, the
+	head and the tail are empty.
+	"""
+
+	m = body_re.match(html)
+	if m == None:
+		return [u'', html, u'']
+	return list(m.groups())
+
+def render_sections(sections):
+
+	"""
+	Renders several sections.
+
+	Arguments:
+	sections	--	A list of unicode strings with Markdown source.
+
+	Returns:
+	A list of [head, body, tail] lists.
+	"""
+
+	return [split(render(section)) for section in sections]
+
+if __name__ == u'__main__':
+
+	sections = json.loads(sys.stdin.read())
+	sys.stdout.write(json.dumps(render_sections(sections)))
@@ -18,7 +18,7 @@ along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from PyQt4 import QtGui, QtCore
-from libquiedit import speller, quiframe
+from libquiedit import quiframe
 
 class prefs(quiframe.quiframe):
 
@@ -55,6 +55,29 @@ class prefs(quiframe.quiframe):
 		self.form.addRow(self.label_speller_enabled, \
 			self.checkbox_speller_enabled)
 		
+		self.checkbox_live_stats = QtGui.QCheckBox()
+		self.checkbox_live_stats.setChecked(self.quiedit.live_stats)
+		self.label_live_stats = QtGui.QLabel(u"Live statistics")
+		self.form.addRow(self.label_live_stats, self.checkbox_live_stats)
+
+		self.spinbox_preview_delay = QtGui.QSpinBox()
+		self.spinbox_preview_delay.setRange(0, 10000)
+		self.spinbox_preview_delay.setSingleStep(100)
+		self.spinbox_preview_delay.setValue(self.quiedit.preview_delay)
+		self.label_preview_delay = QtGui.QLabel( \
+			u"Live preview delay in ms\n(after typing pauses)")
+		self.label_preview_delay.setAlignment(QtCore.Qt.AlignRight)
+		self.form.addRow(self.label_preview_delay, self.spinbox_preview_delay)
+
+		self.spinbox_session_goal = QtGui.QSpinBox()
+		self.spinbox_session_goal.setRange(0, 100000)
+		self.spinbox_session_goal.setSingleStep(100)
+		self.spinbox_session_goal.setValue(self.quiedit.session_goal)
+		self.label_session_goal = QtGui.QLabel( \
+			u"Session goal in words\n(0 to disable)")
+		self.label_session_goal.setAlignment(QtCore.Qt.AlignRight)
+		self.form.addRow(self.label_session_goal, self.spinbox_session_goal)
+
 		self.checkbox_highlighter_enabled = QtGui.QCheckBox()
 		self.checkbox_highlighter_enabled.setChecked( \
 			self.quiedit.highlighter_enabled)
@@ -64,13 +87,24 @@ class prefs(quiframe.quiframe):
 		self.form.addRow(self.label_highlighter_enabled, \
 			self.checkbox_highlighter_enabled)
 
+		self.combobox_highlighter_engine = QtGui.QComboBox(self)
+		for i, engine in enumerate([u'scanner', u'legacy']):
+			self.combobox_highlighter_engine.addItem(engine)
+			if engine == self.quiedit.highlighter_engine:
+				self.combobox_highlighter_engine.setCurrentIndex(i)
+		self.label_highlighter_engine = QtGui.QLabel( \
+			u'Highlighter engine\n(requires restart)')
+		self.label_highlighter_engine.setAlignment(QtCore.Qt.AlignRight)
+		self.form.addRow(self.label_highlighter_engine, \
+			self.combobox_highlighter_engine)
+
 		self.edit_hunspell_path = QtGui.QLineEdit(self.quiedit.hunspell_path)
 		self.label_hunspell_path = QtGui.QLabel(u"Path to hunspell")
 		self.form.addRow(self.label_hunspell_path, self.edit_hunspell_path)
 
 		self.edit_hunspell_dict = QtGui.QLineEdit(self.quiedit.hunspell_dict)
 		self.label_hunspell_dict = QtGui.QLabel( \
-			u"Hunspell dictionary\n(e.g., u'en_US')")
+			u"Hunspell dictionaries\n(e.g., 'en_US' or 'en_US,nl_NL')")
 		self.label_hunspell_dict.setAlignment(QtCore.Qt.AlignRight)
 		self.form.addRow(self.label_hunspell_dict, self.edit_hunspell_dict)
 
@@ -99,17 +133,31 @@ class prefs(quiframe.quiframe):
 		"""Apply changes and resume editing"""
 
 		# Set the speller
-		self.quiedit.speller_enabled = self.checkbox_speller_enabled.isChecked()		
-		self.quiedit.hunspell_path = unicode(self.edit_hunspell_path.text())
-		self.quiedit.hunspell_dict = unicode(self.edit_hunspell_dict.text())
-		self.quiedit.editor.speller = speller.speller(self.quiedit)
+		self.quiedit.speller_enabled = self.checkbox_speller_enabled.isChecked()
+		hunspell_path = unicode(self.edit_hunspell_path.text())
+		hunspell_dict = unicode(self.edit_hunspell_dict.text())
+		# Only reload the dictionary (and thus lose the cached verdicts) if it
+		# has actually changed
+		if hunspell_path != self.quiedit.hunspell_path or hunspell_dict != \
+			self.quiedit.hunspell_dict or not hasattr(self.quiedit.editor, \
+			u'speller'):
+			self.quiedit.hunspell_path = hunspell_path
+			self.quiedit.hunspell_dict = hunspell_dict
+			self.quiedit.editor.set_speller()
 		# Set the theme
 		self.quiedit.theme = unicode(self.combobox_theme.currentText())
 		self.quiedit.set_theme()
 		self.quiedit.auto_indent = self.checkbox_auto_indent.isChecked()
+		self.quiedit.live_stats = self.checkbox_live_stats.isChecked()
+		self.quiedit.session_goal = self.spinbox_session_goal.value()
+		self.quiedit.preview_delay = self.spinbox_preview_delay.value()
+		self.quiedit.preview_timer.setInterval(self.quiedit.preview_delay)
+		self.quiedit.set_status()
 		#
 		self.quiedit.highlighter_enabled = \
 			self.checkbox_highlighter_enabled.isChecked()
+		self.quiedit.highlighter_engine = \
+			unicode(self.combobox_highlighter_engine.currentText())
 		# Continue editing
 		self.quiedit.setCursor(QtCore.Qt.BlankCursor)
 		self.quiedit.show_element(u"editor")
@@ -19,13 +19,15 @@ along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
 
 from PyQt4 import QtGui, QtCore
 from libquiedit import quieditor, speller, prefs, search_edit,_markdown, \
-	command_edit, theme
+	command_edit, theme, loader, saver, journal, session, timing, \
+	resource_cache
 import libquiedit
 import sys
 import os
 import os.path
 import csv
 import re
+import time
 
 class qtquiedit(QtGui.QMainWindow):
 
@@ -41,8 +43,26 @@ class qtquiedit(QtGui.QMainWindow):
 	str_indent = u'\t'
 	ord_indent = 9
 	size_indent = 16
-	speller_local_interval = 1000
-	speller_local_bound = 20
+	speller_local_interval = 250
+	speller_cache_size = 10000
+	speller_batch_size = 1000
+	speller_language_sample = 20
+	loader_chunk_size = 1048576
+	highlighter_batch_size = 500
+	file_loader = None
+	file_saver = None
+	journal_interval = 1000
+	journal_compact_size = 10000
+	live_preview = False
+	last_edit_time = None
+	keypress_budget = 16
+	search_delay = 150
+	stats_interval = 500
+	status_busy = False
+	reading_speed = 250
+	session_interval = 2000
+	session_samples = 1000
+	session_history_days = 90
 	recent_files = []
 
 	def __init__(self, parent=None):
@@ -56,9 +76,12 @@ class qtquiedit(QtGui.QMainWindow):
 
 		self.debug = "--debug" in sys.argv
 		QtGui.QMainWindow.__init__(self, parent)
+		self.resource_paths = {}
+		resource_cache.set_path(os.path.join(self.user_folder(), \
+			u"resources.cache"))
 		self.restore_state()
 		self.set_theme()
-		self.editor.check_locally()
+		timing.mark(u'apply theme')
 		self.editor.setFocus()
 
 	def add_recent_file(self, path):
@@ -98,13 +121,28 @@ class qtquiedit(QtGui.QMainWindow):
 			u"sebastiaan", "mathot"]).toList()
 		self.highlighter_enabled = settings.value(u"highlighter_enabled", \
 			True).toBool()
+		self.highlighter_engine = unicode(settings.value( \
+			u"highlighter_engine", u"scanner").toString())
+		self.preview_delay = settings.value(u"preview_delay", 1000).toInt()[0]
+		self.live_stats = settings.value(u"live_stats", False).toBool()
+		self.session_goal = settings.value(u"session_goal", 500).toInt()[0]
+		self.search_case_sensitive = settings.value( \
+			u"search_case_sensitive", False).toBool()
+		self.search_whole_word = settings.value(u"search_whole_word", \
+			False).toBool()
+		self.search_regex = settings.value(u"search_regex", False).toBool()
 		self.hunspell_dict = unicode(settings.value(u"hunspell_dict", \
 			u"en_US").toString())
 		self.hunspell_path = unicode(settings.value(u"hunspell_path", \
 			speller.locate_hunspell_path()).toString())
 		self.theme = unicode(settings.value(u"theme", u"default").toString())
+		timing.mark(u'restore settings')
 		self._theme = theme.theme(self)
+		timing.mark(u'load themes')
 		self.build_gui()
+		timing.mark(u'build gui')
+		self.journal = journal.journal(self)
+		self.session = session.session(self)
 		self.current_path = unicode(settings.value(u"current_path", u"") \
 			.toString())
 		if self.current_path == u"":
@@ -112,10 +150,10 @@ class qtquiedit(QtGui.QMainWindow):
 		else:
 			self.set_status(u"Resuming %s" % os.path.basename( \
 				self.current_path))
-		self.restore_content()
-		self.editor.set_cursor(settings.value(u"cursor_pos", 0).toInt()[0])
+		self.restore_content(settings.value(u"cursor_pos", 0).toInt()[0])
 		self.recent_files = settings.value(u"recent_files", []).toList()
 		settings.endGroup();
+		timing.mark(u'restore content')
 
 	def save_state(self):
 
@@ -131,6 +169,13 @@ class qtquiedit(QtGui.QMainWindow):
 		settings.setValue("speller_enabled", self.speller_enabled)
 		settings.setValue("speller_suggest", self.speller_suggest)
 		settings.setValue("highlighter_enabled", self.highlighter_enabled)
+		settings.setValue("highlighter_engine", self.highlighter_engine)
+		settings.setValue("preview_delay", self.preview_delay)
+		settings.setValue("live_stats", self.live_stats)
+		settings.setValue("session_goal", self.session_goal)
+		settings.setValue("search_case_sensitive", self.search_case_sensitive)
+		settings.setValue("search_whole_word", self.search_whole_word)
+		settings.setValue("search_regex", self.search_regex)
 		settings.setValue("speller_ignore", self.speller_ignore)
 		settings.setValue("hunspell_dict", self.hunspell_dict)
 		settings.setValue("hunspell_path", self.hunspell_path)
@@ -138,12 +183,19 @@ class qtquiedit(QtGui.QMainWindow):
 		settings.setValue("theme", self.theme)
 		settings.setValue("current_path", self.current_path)
 		settings.setValue("recent_files", self.recent_files)
+		self.session.store(settings)
 		settings.endGroup()
 		self.save_content()
 
-	def restore_content(self):
+	def restore_content(self, cursor_pos=0):
 
-		"""Restore the contents"""
+		"""
+		Restore the contents
+
+		Keyword arguments:
+		cursor_pos -- the cursor position to restore once the contents have
+					  been loaded (default=0)
+		"""
 
 		# If we were working on a file, open it and resume.
 		if self.current_path not in (u'', None):
@@ -155,54 +207,151 @@ class qtquiedit(QtGui.QMainWindow):
 					% os.path.basename(self.current_path))
 				self.current_path = u''
 				self.editor.clear()
+				self.content_restored(cursor_pos)
 				return
-			print(u'qtquiedit.restore_content(): opening %s' \
-				% self.current_path)
-			content = open(self.current_path).read().decode(self.encoding, \
-				u'ignore')
+			path = self.current_path
 		# If we were not working on a file, see if there is a saved file and
 		# start from there. If not, start with a clear file.
 		else:
-			saved_content_path = self.saved_content_file()
-			if not os.path.exists(saved_content_path):
+			path = self.saved_content_file()
+			if not os.path.exists(path):
 				self.editor.clear()
+				self.content_restored(cursor_pos)
 				return
-			content = open(saved_content_path).read().decode(self.encoding, \
-				u'ignore')
-			print(u'qtquiedit.restore_content(): opening %s' \
-				% saved_content_path)
-		self.editor.set_text(content)
+		print(u'qtquiedit.restore_content(): opening %s' % path)
+		self.load_file(path, lambda: self.content_restored(cursor_pos))
+
+	def content_restored(self, cursor_pos):
+
+		"""
+		Is called when the contents have been restored.
+
+		Arguments:
+		cursor_pos -- the cursor position to restore
+		"""
+
+		self.set_unsaved(False)
+		self.recover_edits()
+		self.session.rebase()
+		self.editor.set_cursor(cursor_pos)
+		self.editor.check_entire_document()
+
+	def recover_edits(self):
+
+		"""
+		Recovers the edits from the journal, if the application did not shut
+		down cleanly and the edits apply to the current file. The user is asked
+		first.
+		"""
+
+		path = self.current_path or None
+		current = unicode(self.editor.toPlainText())
+		recovered = self.journal.recover(path, current)
+		self.journal.reset(path, current)
+		if recovered == None:
+			return
+		text, n = recovered
+		self.minimize_win()
+		answer = QtGui.QMessageBox.question(self, u"Recover edits", \
+			u"Quiedit was not closed properly. Recover %d unsaved edits?" % n, \
+			QtGui.QMessageBox.No, QtGui.QMessageBox.Yes)
+		self.restore_win()
+		if answer == QtGui.QMessageBox.No:
+			return
+		self.journal.restore(text)
+		self.set_unsaved(True)
+		self.set_status(u"Recovered %d unsaved edits" % n)
+
+	def load_file(self, path, callback):
+
+		"""
+		Loads a file into the editor in chunks. Spellchecking and highlighting
+		are deferred until the file has been loaded.
+
+		Arguments:
+		path		--	The file to load.
+		callback	--	A function to call when the file has been loaded.
+		"""
+
+		if self.file_loader != None:
+			self.file_loader.cancel()
+		self.file_loader = loader.loader(self, path)
+		self.file_loader.finished.connect(callback)
+		self.file_loader.start()
 
 	def save_content(self):
 
 		"""Save the contents"""
 
+		# Saving a partially loaded file would truncate it
+		if self.editor.loading:
+			print(u'qtquiedit.save_content(): still loading, not saving')
+			return
 		if self.current_path in (u'', None):
 			path = self.saved_content_file()
 		else:
 			path = self.current_path
 		print(u'qtquiedit.save_content(): saving to %s' % path)
-		fd = open(path, u'w')
-		fd.write(unicode(self.editor.toPlainText()).encode(u'utf-8'))
-		fd.close()
+		# The application is closing, so save synchronously, but not before a
+		# pending background save has finished.
+		if self.file_saver != None:
+			self.file_saver.wait()
+		text = unicode(self.editor.toPlainText())
+		saver.write_atomic(path, saver.encode(text, self.encoding))
+		self.journal.reset(self.current_path or None, text)
 
-	def saved_content_file(self):
+	def home_folder(self):
 
 		"""
-		Gets the path to the content file.
+		Gets the user's home folder.
 
 		Returns:
-		The path to the content file.
+		The path to the home folder.
 		"""
 
 		if os.name == u'posix':
 			home_folder = os.environ[u"HOME"]
 		else:
 			home_folder = os.environ[u"USERPROFILE"]
-		path = os.path.join(home_folder.decode(sys.getfilesystemencoding()), \
-			u".quiedit-saved-content")
+		return home_folder.decode(sys.getfilesystemencoding())
+
+	def user_folder(self):
+
+		"""
+		Gets the folder for user data, such as caches, and creates it if it
+		does not exist yet.
+
+		Returns:
+		The path to the user folder.
+		"""
+
+		path = os.path.join(self.home_folder(), u".quiedit")
+		if not os.path.exists(path):
+			os.makedirs(path)
 		return path
 
+	def saved_content_file(self):
+
+		"""
+		Gets the path to the content file.
+
+		Returns:
+		The path to the content file.
+		"""
+
+		return os.path.join(self.home_folder(), u".quiedit-saved-content")
+
+	def journal_file(self):
+
+		"""
+		Gets the path to the journal of unsaved edits.
+
+		Returns:
+		The path to the journal file.
+		"""
+
+		return os.path.join(self.home_folder(), u".quiedit-journal")
+
 	def minimize_win(self):
 
 		"""Minimize the window if it is fullscreen"""
@@ -240,21 +389,31 @@ class qtquiedit(QtGui.QMainWindow):
 		if os.path.exists(path):
 			ext = os.path.splitext(path)[1].lower()
 			try:
-				s = open(path).read().decode(self.encoding, u'ignore')
-				self.editor.clear()
 				self.editor.setAcceptRichText(True)
-				self.editor.set_text(s)
-				self.current_path = path
-				self.set_status(u"Opened %s" % os.path.basename(path))
-				self.set_unsaved(False)
-				self.editor.check_entire_document()
-				self.add_recent_file(path)
+				self.load_file(path, lambda: self.file_opened(path))
 			except Exception as e:
 				self.set_status(u"Error: %s" % e)
 		else:
 			self.set_status(u"File does not exist")
 		self.show_element(u"editor")
 
+	def file_opened(self, path):
+
+		"""
+		Is called when a file has been opened.
+
+		Arguments:
+		path	--	The path of the file.
+		"""
+
+		self.current_path = path
+		self.set_status(u"Opened %s" % os.path.basename(path))
+		self.set_unsaved(False)
+		self.journal.reset(path, unicode(self.editor.toPlainText()))
+		self.session.rebase()
+		self.editor.check_entire_document()
+		self.add_recent_file(path)
+
 	def set_unsaved(self, unsaved_changes=True):
 
 		"""
@@ -280,6 +439,11 @@ class qtquiedit(QtGui.QMainWindow):
 		fmt -- indicates the file format. Can be 'html' or 'text'
 		"""
 
+		# Saving a partially loaded file would truncate it
+		if self.editor.loading:
+			self.set_status(u"Please wait until the file has been loaded")
+			return
+
 		if self.current_path == None or always_ask:
 			title = u"Save file as"
 			flt = u"Markdown source (*.md *.markdown);;Plain text (*.txt)"
@@ -297,28 +461,64 @@ class qtquiedit(QtGui.QMainWindow):
 				path += defaultExt
 			self.current_path = path
 
-		path = self.current_path
-		ext = os.path.splitext(path)[1].lower()
-		contents = unicode(self.editor.toPlainText())
-		contents = contents.replace(unicode(os.linesep), u'\n')
-		if not contents.endswith(u'\n'):
-			contents += u'\n'
-
-		# Write the file contents to disk
-		try:
-			open(path, u"w").write(contents.encode(self.encoding))
-			self.set_status(u"Saved as %s" % os.path.basename(path))
+		# Write a snapshot of the file contents to disk in the background. Saves
+		# are done one at a time, so that they cannot overtake each other.
+		if self.file_saver != None:
+			self.file_saver.wait()
+		text = unicode(self.editor.toPlainText())
+		self.file_saver = saver.saver(self, self.current_path, text, \
+			self.encoding)
+		self.file_saver.saved.connect(self.file_saved)
+		self.file_saver.failed.connect(self.file_save_failed)
+		# The journal is only rebased on the saved text if it still describes
+		# the same document once the save has finished
+		self.file_saver.journal_generation = self.journal.generation
+		self.saved_revision = self.editor.text_revision
+		self.file_saver.start()
+		self.show_element(u"editor")
+
+	def file_saved(self, path):
+
+		"""
+		Is called when a file has been saved.
+
+		Arguments:
+		path	--	The path of the file.
+		"""
+
+		path = unicode(path)
+		# The journal continues from the text that has actually been written.
+		# Until then, the old journal still describes the unsaved edits.
+		self.journal.rebase(path, self.sender().text, \
+			self.sender().journal_generation)
+		self.set_status(u"Saved as %s" % os.path.basename(path))
+		# The document may have been edited during saving
+		if self.editor.text_revision == self.saved_revision:
 			self.set_unsaved(False)
-			self.add_recent_file(path)
-		except Exception as e:
-			self.set_status(u"Error: %s" % e)
+		self.add_recent_file(path)
 
-		self.show_element(u"editor")
+	def file_save_failed(self, path, msg):
+
+		"""
+		Is called when a file could not be saved.
+
+		Arguments:
+		path	--	The path of the file.
+		msg		--	The error message.
+		"""
+
+		self.set_status(u"Error: %s" % msg)
 
 	def new_file(self):
 
 		"""Clear the buffer and start a new file"""
 
+		# A file that is still being loaded has not been modified, so there is
+		# nothing to save
+		if self.editor.loading:
+			self.file_loader.cancel()
+			self.set_unsaved(False)
+
 		if self.unsaved_changes and self.editor.toPlainText().trimmed() != u'':
 
 			#self.minimize_win()
@@ -333,6 +533,8 @@ class qtquiedit(QtGui.QMainWindow):
 		self.editor.clear()
 		self.editor.setAcceptRichText(False)
 		self.current_path = None
+		self.journal.reset(None, u'')
+		self.session.rebase()
 		self.set_status(u"Starting new file")
 		self.set_unsaved(False)
 		self.show_element(u"editor")
@@ -340,7 +542,8 @@ class qtquiedit(QtGui.QMainWindow):
 	def get_resource(self, res):
 
 		"""
-		Gives the full path to a resource file
+		Gives the full path to a resource file. Paths are remembered, so that
+		the resource folders are only searched once for each resource.
 
 		Arguments:
 		res -- name of the resource file
@@ -349,9 +552,12 @@ class qtquiedit(QtGui.QMainWindow):
 		The full path to the resource
 		"""
 
+		if res in self.resource_paths:
+			return self.resource_paths[res]
 		for f in self.resource_folders():
 			path = os.path.join(f, res)
 			if os.path.exists(path):
+				self.resource_paths[res] = path
 				return path
 		raise Exception(u"Failed to find resource '%s'" % res)
 
@@ -399,7 +605,7 @@ class qtquiedit(QtGui.QMainWindow):
 		# Search widget, visible in editor component
 		self.search_edit = search_edit.search_edit(self)
 		self.search_edit.returnPressed.connect(self.editor.perform_search)
-		self.search_label = QtGui.QLabel(u"Search:")
+		self.search_label = QtGui.QLabel(self.search_edit.label())
 		self.search_layout = QtGui.QHBoxLayout()
 		self.search_layout.addWidget(self.search_label)
 		self.search_layout.addWidget(self.search_edit)
@@ -419,31 +625,36 @@ class qtquiedit(QtGui.QMainWindow):
 		self.command_box.setLayout(self.command_layout)
 		self.command_box.hide()
 
-		# Help component
-		self.help = quieditor.quieditor(self, readonly=True)
-		self.help.setFrameStyle(QtGui.QFrame.NoFrame)
-		self.help.set_text(open(self.get_resource(u'keybindings.conf')) \
-			.read())
-		self.help.hide()
-
-		# Preferences component
-		self.prefs = prefs.prefs(self)
-		self.prefs.hide()
-
-		# Markdown component
-		self._markdown = _markdown._markdown(self)
-		self._markdown.setFrameStyle(QtGui.QFrame.NoFrame)
-		self._markdown.hide()
+		# The help, preferences, and Markdown components are built when they
+		# are first used
+		self.components = {}
+
+		# The live preview is updated when the user pauses typing
+		self.preview_timer = QtCore.QTimer(self)
+		self.preview_timer.setSingleShot(True)
+		self.preview_timer.setInterval(self.preview_delay)
+		self.preview_timer.timeout.connect(self.refresh_preview)
+		self.editor.textChanged.connect(self.schedule_preview)
+
+		# The live statistics are updated once the user pauses typing
+		self.stats_timer = QtCore.QTimer(self)
+		self.stats_timer.setSingleShot(True)
+		self.stats_timer.setInterval(self.stats_interval)
+		self.stats_timer.timeout.connect(self.show_live_stats)
+		self.editor.textChanged.connect(self.schedule_live_stats)
+
+		# The editor and the Markdown preview are shown side by side in live
+		# preview mode
+		self.editor_splitter = QtGui.QSplitter(QtCore.Qt.Horizontal)
+		self.editor_splitter.addWidget(self.editor)
+		self.editor_splitter.setHandleWidth(0)
 
 		# Layout for all components, only one of which is visible at a time
 		self.editor_layout = QtGui.QVBoxLayout()
 		self.editor_layout.setContentsMargins(0, 0, 0, 0)
-		self.editor_layout.addWidget(self.editor)
-		self.editor_layout.addWidget(self.help)
-		self.editor_layout.addWidget(self.prefs)
+		self.editor_layout.addWidget(self.editor_splitter)
 		self.editor_layout.addWidget(self.search_box)
 		self.editor_layout.addWidget(self.command_box)
-		self.editor_layout.addWidget(self._markdown)
 		self.editor_layout.setSpacing(0)
 		self.editor_frame = QtGui.QFrame()
 		self.editor_frame.setFrameStyle(QtGui.QFrame.Box)
@@ -468,6 +679,61 @@ class qtquiedit(QtGui.QMainWindow):
 		self.main_widget.setLayout(self.main_hbox)
 		self.setCentralWidget(self.main_widget)
 
+	def component(self, name):
+
+		"""
+		Gets a component, and builds it if it has not been built yet.
+
+		Arguments:
+		name		--	One of 'help', 'prefs', and 'markdown'.
+
+		Returns:
+		A QWidget.
+		"""
+
+		if name in self.components:
+			return self.components[name]
+		if name == u"help":
+			widget = quieditor.quieditor(self, readonly=True)
+			widget.setFrameStyle(QtGui.QFrame.NoFrame)
+			widget.set_text(open(self.get_resource(u'keybindings.conf')) \
+				.read())
+			self.editor_layout.insertWidget(1, widget)
+		elif name == u"prefs":
+			widget = prefs.prefs(self)
+			self.editor_layout.insertWidget(1, widget)
+		else:
+			widget = _markdown._markdown(self)
+			widget.setFrameStyle(QtGui.QFrame.NoFrame)
+			self.editor_splitter.addWidget(widget)
+		widget.hide()
+		self.components[name] = widget
+		self._theme.apply_component(widget)
+		if self.debug:
+			print(u'qtquiedit.component(): built %s' % name)
+		return widget
+
+	@property
+	def help(self):
+
+		"""The help component."""
+
+		return self.component(u"help")
+
+	@property
+	def prefs(self):
+
+		"""The preferences component."""
+
+		return self.component(u"prefs")
+
+	@property
+	def _markdown(self):
+
+		"""The Markdown component."""
+
+		return self.component(u"markdown")
+
 	def set_theme(self):
 
 		"""Sets the current theme"""
@@ -494,8 +760,11 @@ class qtquiedit(QtGui.QMainWindow):
 		msg -- the message (default="")
 		"""
 
+		self.status_busy = msg != u""
+		if not self.status_busy and self.live_stats:
+			msg = self.editor.stats.summary()
 		self.status.setText(msg)
-		if msg != u"":
+		if self.status_busy:
 			QtCore.QTimer.singleShot(self.status_timeout, self.set_status)
 
 	def show_element(self, element):
@@ -507,10 +776,82 @@ class qtquiedit(QtGui.QMainWindow):
 		element -- one of the elements
 		"""
 
-		self.help.setVisible(element == "help")
-		self.prefs.setVisible(element == "prefs")
+		live = element == "editor" and self.live_preview
+		# Components are only built when they are shown
+		for name, visible in [(u"help", element == "help"), (u"prefs", \
+			element == "prefs"), (u"markdown", element == "markdown" or live)]:
+			if visible or name in self.components:
+				self.component(name).setVisible(visible)
 		self.editor.setVisible(element == "editor")
-		self._markdown.setVisible(element == "markdown")
+		self.set_editor_width(live)
+
+	def set_editor_width(self, live=None):
+
+		"""
+		Sets the width of the editor, as specified by the theme. The live
+		preview needs room next to the editor, so the width is doubled when the
+		preview is shown.
+
+		Keyword arguments:
+		live -- indicates whether the live preview is shown, or None to check
+				whether the editor is shown in live preview mode (default=None)
+		"""
+
+		if live == None:
+			live = self.live_preview and not self.editor.isHidden()
+		width = int(self._theme.theme[u"editor_width"])
+		if live:
+			width *= 2
+		self.central_widget.setMinimumWidth(width)
+		self.central_widget.setMaximumWidth(width)
+
+	def toggle_live_preview(self):
+
+		"""Toggles the side-by-side live preview of the Markdown output."""
+
+		self.live_preview = not self.live_preview
+		if self.live_preview:
+			self._markdown.refresh()
+			self.set_status(u"Live preview")
+		else:
+			self.preview_timer.stop()
+			self.set_status(u"Resuming")
+		self.show_element(u"editor")
+		self.editor.setFocus()
+
+	def schedule_preview(self):
+
+		"""
+		Updates the live preview once the user pauses typing. A burst of edits
+		thus results in a single render.
+		"""
+
+		if not self.live_preview:
+			return
+		self.last_edit_time = time.time()
+		self.preview_timer.start()
+
+	def schedule_live_stats(self):
+
+		"""Updates the live statistics once the user pauses typing."""
+
+		if self.live_stats:
+			self.stats_timer.start()
+
+	def show_live_stats(self):
+
+		"""
+		Shows the statistics in the status bar, unless a message is shown.
+		"""
+
+		if self.live_stats and not self.status_busy:
+			self.status.setText(self.editor.stats.summary())
+
+	def refresh_preview(self):
+
+		"""Updates the live preview."""
+
+		self._markdown.refresh()
 
 	def closeEvent(self, event):
 
@@ -521,6 +862,13 @@ class qtquiedit(QtGui.QMainWindow):
 		event -- a closeEvent
 		"""
 
+		self.editor.cancel_spelling()
+		if hasattr(self.editor, u"speller"):
+			self.editor.speller.wait()
+			self.editor.speller.flush()
 		self.save_state()
+		if self.file_saver != None:
+			self.file_saver.wait()
+		self.journal.close()
 		event.accept()
 
@@ -18,14 +18,23 @@ along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os
+import re
 import time
 from PyQt4 import QtGui, QtCore
-from libquiedit import speller, highlighter
+from libquiedit import speller, speller_thread, highlighter, keymap, search, \
+	stats
 
 class quieditor(QtGui.QTextEdit):
 
 	"""A fancy text editor"""
 
+	# The keys that trigger the auto-indent hacks and the spellchecker
+	unindent_keys = QtCore.Qt.Key_Backspace, QtCore.Qt.Key_Left
+	skip_indent_keys = QtCore.Qt.Key_Delete, QtCore.Qt.Key_Right, \
+		QtCore.Qt.Key_Down, QtCore.Qt.Key_Up
+	spelling_keys = QtCore.Qt.Key_Space, QtCore.Qt.Key_Backspace, \
+		QtCore.Qt.Key_Delete
+
 	def __init__(self, parent=None, readonly=False):
 
 		"""
@@ -39,16 +48,50 @@ class quieditor(QtGui.QTextEdit):
 
 		super(quieditor, self).__init__(parent)
 		self.quiedit = parent
-		self.speller_lock = False
+		self.speller_thread = None
+		# The dictionary that is named in the document, if any
+		self.language_hint = None
+		self.loading = False
+		self.text_revision = 0
+		self.document().contentsChange.connect(self.contents_changed)
+		# Checks the visible blocks shortly after the document has been edited
+		# or scrolled, so that an idle editor does not use any CPU.
+		self.spelling_timer = QtCore.QTimer(self)
+		self.spelling_timer.setSingleShot(True)
+		self.spelling_timer.setInterval(self.quiedit.speller_local_interval)
+		self.spelling_timer.timeout.connect(self.check_viewport)
+		self.verticalScrollBar().valueChanged.connect(self.spelling_timer.start)
+		# Checks the word that was just typed once the keystroke has been
+		# processed
+		self.word_timer = QtCore.QTimer(self)
+		self.word_timer.setSingleShot(True)
+		self.word_timer.setInterval(0)
+		self.word_timer.timeout.connect(self.check_current_word)
+		# Highlights the document in batches after a file has been loaded
+		self.highlight_timer = QtCore.QTimer(self)
+		self.highlight_timer.setInterval(0)
+		self.highlight_timer.timeout.connect(self.highlight_batch)
+		self.highlight_number = 0
+		self.search = search.search(self)
+		self.stats = stats.stats(self)
+		if not readonly:
+			self.verticalScrollBar().valueChanged.connect( \
+				self.highlight_matches)
 		self.setReadOnly(readonly)
 		self.textChanged.connect(self.quiedit.set_unsaved)
 		self.set_keybindings()
+		self.register_default_actions()
 		self.setTabStopWidth(self.quiedit.size_indent)
 		self.anchorTextCursor = None
-		if self.quiedit.speller_enabled:
-			self.speller = speller.speller(self.quiedit)
-		if not readonly and self.quiedit.highlighter_enabled:
-			highlighter.MarkdownHighlighter(self)
+		# Read-only editors are not spellchecked
+		if self.quiedit.speller_enabled and not readonly:
+			self.set_speller()
+		if readonly:
+			self.highlighter = None
+		elif self.quiedit.highlighter_enabled:
+			self.highlighter = highlighter.MarkdownHighlighter(self)
+		else:
+			self.highlighter = highlighter.SpellingHighlighter(self)
 
 	def format_selection(self, fmt):
 
@@ -129,22 +172,6 @@ class quieditor(QtGui.QTextEdit):
 		return (modifier == None or event.modifiers() == modifier) and \
 			event.key() == key
 
-	def keybinding_match(self, event, function):
-
-		"""
-		Checks if a QKeyEvent matches a keybdingin
-
-		Arguments:
-		event -- a QKeyEvent
-		function -- a function name
-
-		Returns:
-		True on a match, False otherwise
-		"""
-
-		return event.modifiers() == self.keybindings[function][1] and \
-			event.key() == self.keybindings[function][0]
-
 	def speller_style(self):
 
 		"""
@@ -180,91 +207,309 @@ class quieditor(QtGui.QTextEdit):
 			word = None
 		return word
 
+	def spelling_ranges(self, text, language=None):
+
+		"""
+		Checks the spelling of a block of text.
+
+		Arguments:
+		text		--	A unicode string.
+
+		Keyword arguments:
+		language	--	The dictionary to use, or None to use the default
+						dictionary. (default=None)
+
+		Returns:
+		A list of (position, length) tuples of misspelled words.
+		"""
+
+		misspelled = []
+		for m in speller.word_re.finditer(text):
+			word = m.group()
+			if len(word) > 2 and not self.speller.check(word, language):
+				misspelled.append((m.start(), len(word)))
+		return misspelled
+
+	def block_language(self, data, text):
+
+		"""
+		Gives the dictionary for a block. The language is only guessed again
+		when the block has changed, and a block keeps its language unless
+		another dictionary knows more of its words.
+
+		Arguments:
+		data		--	The block_data of the block.
+		text		--	The text of the block as a unicode string.
+
+		Returns:
+		A dictionary name, or None for the default dictionary.
+		"""
+
+		if data.language_hash != hash(text):
+			default = data.language
+			if default == None:
+				default = self.language_hint
+			data.language = self.speller.guess_language(text, default)
+			data.language_hash = hash(text)
+		return data.language
+
+	def check_block(self, block):
+
+		"""
+		Checks the spelling of a single block, and underlines the misspelled
+		words.
+
+		Arguments:
+		block		--	A QTextBlock.
+		"""
+
+		if not self.quiedit.speller_enabled or self.highlighter == None or \
+			not block.isValid():
+			return
+		text = unicode(block.text())
+		data = highlighter.get_block_data(block)
+		misspelled = self.spelling_ranges(text, self.block_language(data, text))
+		if data.checked_hash == hash(text) and data.misspelled == misspelled:
+			return
+		data.misspelled = misspelled
+		data.checked_hash = hash(text)
+		self.highlighter.rehighlightBlock(block)
+
 	def check_entire_document(self):
 
-		"""Perform spellchecking on the entire document"""
+		"""
+		Perform spellchecking on the entire document. The words are checked in
+		a background thread, and misspelled words are underlined as the results
+		come in.
+		"""
 
-		if not self.quiedit.speller_enabled:
+		if not self.quiedit.speller_enabled or self.highlighter == None or \
+			self.loading:
 			return
+		# The document is checked once the dictionary has been loaded
+		if self.speller.loading:
+			return
+		self.cancel_spelling()
+		# Check all words in a snapshot of the document
+		text = unicode(self.toPlainText())
+		self.language_hint = self.speller.hint(text)
+		# Pass the languages that have already been guessed, so that they are
+		# only guessed again for blocks that have changed
+		languages = []
+		block = self.document().begin()
+		while block.isValid():
+			data = block.userData()
+			if data == None:
+				languages.append((None, None))
+			else:
+				languages.append((data.language, data.language_hash))
+			block = block.next()
+		self.speller_thread = speller_thread.speller_thread(self, text, \
+			self.text_revision, languages)
+		self.speller_thread.misspelled.connect(self.apply_misspelled)
+		self.speller_thread.finished.connect(self.spelling_finished)
+		self.speller_thread.start(QtCore.QThread.LowPriority)
 
-		# Remove underline for the document
-		fmt = QtGui.QTextCharFormat()
-		fmt.setFontUnderline(False)
-		cursor = self.textCursor()
-		cursor.joinPreviousEditBlock()
-		cursor.select(QtGui.QTextCursor.Document)
-		cursor.mergeCharFormat(fmt)
+	def set_speller(self):
 
-		# Check all words
-		fmt = self.speller_style()
-		cursor = self.textCursor()
-		cursor.movePosition(QtGui.QTextCursor.Start)
-		while not cursor.atEnd():
-			word = self.current_word(cursor)
-			if word == None or word == u"":
-				cursor.movePosition(QtGui.QTextCursor.NextWord)
-				continue
-			if len(word) > 2 and not self.speller.check(word):
-				cursor.mergeCharFormat(fmt)
-			cursor.movePosition(QtGui.QTextCursor.NextWord)
-		cursor.endEditBlock()
+		"""
+		Creates a new speller, for example after the dictionary has been
+		changed. The dictionary is loaded in the background, and the entire
+		document is checked once it has been loaded.
+		"""
 
-	def check_locally(self):
+		self.cancel_spelling()
+		self.speller = speller.speller(self.quiedit)
+		self.speller.ready.connect(self.speller_ready)
 
-		"""Periodically perform spell checking around the cursor"""
+	def speller_ready(self):
 
-		if not self.quiedit.speller_enabled:
+		"""
+		Is called when the dictionaries have been loaded. The languages of the
+		blocks have been guessed without these dictionaries, so they are
+		guessed again when the entire document is checked.
+		"""
+
+		block = self.document().begin()
+		while block.isValid():
+			data = block.userData()
+			if data != None:
+				data.language_hash = None
+			block = block.next()
+		self.check_entire_document()
+
+	def contents_changed(self, pos, removed, added):
+
+		"""
+		Keeps track of the text revision, and schedules a spellcheck of the
+		visible blocks.
+
+		Arguments:
+		pos			--	The position of the change.
+		removed		--	The number of removed characters.
+		added		--	The number of added characters.
+		"""
+
+		self.text_revision += 1
+		if self.highlighter != None and not self.loading:
+			self.spelling_timer.start()
+
+	def cancel_spelling(self):
+
+		"""Stops the background spellcheck, if any."""
+
+		if self.speller_thread == None:
 			return
+		self.speller_thread.cancel()
+		self.speller_thread.wait()
+		self.speller_thread = None
 
-		# Remove underline for the current section
-		fmt = QtGui.QTextCharFormat()
-		fmt.setFontUnderline(False)
-		cursor = self.textCursor()
-		cursor.joinPreviousEditBlock()
-		cursor.movePosition(QtGui.QTextCursor.PreviousWord, \
-			QtGui.QTextCursor.MoveAnchor, self.quiedit.speller_local_bound)
-		cursor.movePosition(QtGui.QTextCursor.NextWord, \
-			QtGui.QTextCursor.KeepAnchor, 2 * self.quiedit.speller_local_bound)
-		cursor.mergeCharFormat(fmt)
-
-		# Check all words
-		cursor = self.textCursor()
-		cursor.movePosition(QtGui.QTextCursor.PreviousWord, \
-			n=self.quiedit.speller_local_bound)
+	def apply_misspelled(self, revision, blocks):
+
+		"""
+		Underlines the misspelled words in a batch of blocks that has been
+		checked by the background spellcheck.
+
+		Arguments:
+		revision	--	The document revision that the batch refers to.
+		blocks		--	A list of (block number, text hash, misspelled,
+						language) tuples.
+		"""
+
+		if self.sender() is not self.speller_thread:
+			return
+		# If the document has been edited since the snapshot was taken, the
+		# block numbers are no longer valid.
+		if revision != self.text_revision:
+			if self.quiedit.debug:
+				print(u'quieditor.apply_misspelled(): document changed')
+			self.cancel_spelling()
+			return
+		for number, text_hash, misspelled, language in blocks:
+			block = self.document().findBlockByNumber(number)
+			data = highlighter.get_block_data(block)
+			data.language = language
+			data.language_hash = text_hash
+			# Only rehighlight if the underlines have actually changed
+			changed = data.misspelled != misspelled
+			data.misspelled = misspelled
+			data.checked_hash = text_hash
+			if changed:
+				self.highlighter.rehighlightBlock(block)
+
+	def spelling_finished(self):
+
+		"""Is called when the background spellcheck is done."""
+
+		if self.sender() is not self.speller_thread:
+			return
+		self.speller_thread = None
+		self.speller.flush()
+		if self.quiedit.debug:
+			print(u'quieditor.spelling_finished(): ' \
+				u'%d hits, %d misses, %d cached' % self.speller.cache_info())
+
+	def visible_blocks(self):
+
+		"""
+		Gives the blocks that are currently visible in the viewport.
 
-		for i in range(2 * self.quiedit.speller_local_bound):
-			if cursor.atEnd():
+		Returns:
+		A list of QTextBlock objects.
+		"""
+
+		first = self.cursorForPosition(QtCore.QPoint(0, 0)).block()
+		last = self.cursorForPosition(QtCore.QPoint(self.viewport().width(), \
+			self.viewport().height())).block().blockNumber()
+		blocks = []
+		block = first
+		while block.isValid() and block.blockNumber() <= last:
+			blocks.append(block)
+			block = block.next()
+		return blocks
+
+	def rehighlight_in_batches(self):
+
+		"""
+		Highlights the entire document, for example after a file has been
+		loaded without highlighting. The visible blocks are highlighted right
+		away, and the rest of the document is highlighted in batches from the
+		event loop, so that the GUI stays responsive.
+		"""
+
+		if self.highlighter == None:
+			return
+		for block in self.visible_blocks():
+			self.highlighter.rehighlightBlock(block)
+		self.highlight_number = 0
+		self.highlight_timer.start()
+
+	def highlight_batch(self):
+
+		"""Highlights the next batch of blocks."""
+
+		# A file that is being loaded is highlighted once it has been loaded
+		if self.loading:
+			self.highlight_timer.stop()
+			return
+		# The user may have scrolled to a part that has not been highlighted
+		for block in self.visible_blocks():
+			if block.userData() == None:
+				self.highlighter.rehighlightBlock(block)
+		block = self.document().findBlockByNumber(self.highlight_number)
+		for i in range(self.quiedit.highlighter_batch_size):
+			if not block.isValid():
 				break
-			word = self.current_word(cursor)
-			if word == None or word == "":
-				cursor.movePosition(QtGui.QTextCursor.NextWord)
-				continue
-			if len(word) > 2 and not self.speller.check(word):
-				cursor.mergeCharFormat(self.speller_style())
-			cursor.movePosition(QtGui.QTextCursor.NextWord)
-		cursor.endEditBlock()
-		QtCore.QTimer.singleShot(self.quiedit.speller_local_interval, \
-			self.check_locally)
+			self.highlighter.rehighlightBlock(block)
+			block = block.next()
+		if not block.isValid():
+			self.highlight_timer.stop()
+			return
+		self.highlight_number = block.blockNumber()
+
+	def check_viewport(self):
+
+		"""
+		Perform spellchecking on the visible blocks that have been changed or
+		have not been checked yet.
+		"""
+
+		if not self.quiedit.speller_enabled or self.highlighter == None:
+			return
+		for block in self.visible_blocks():
+			data = block.userData()
+			if data == None or data.checked_hash != hash(unicode(block.text())):
+				self.check_block(block)
+
+	def resizeEvent(self, event):
+
+		"""
+		Checks the newly visible blocks after a resize.
+
+		Arguments:
+		event	--	A QResizeEvent.
+		"""
+
+		super(quieditor, self).resizeEvent(event)
+		if self.highlighter != None:
+			self.spelling_timer.start()
 
 	def check_current_word(self):
 
 		"""Underline the currently selected word if it is incorrect"""
 
-		if not self.quiedit.speller_enabled:
+		if not self.quiedit.speller_enabled or not hasattr(self, u'speller'):
 			return
 
 		cursor = self.textCursor()
-		cursor.joinPreviousEditBlock()
-		pos = cursor.position()
+		self.check_block(cursor.block())
 		cursor.movePosition(QtGui.QTextCursor.PreviousCharacter, \
 			QtGui.QTextCursor.MoveAnchor, 1)
 		word = self.current_word(cursor)
-		if word != None and len(word) > 2 and not self.speller.check(word):
-			fmt = self.speller_style()
-			if self.quiedit.speller_suggest:
-				self.suggest_alternatives(word)
-			cursor.mergeCharFormat(fmt)
-		cursor.endEditBlock()
+		language = highlighter.get_block_data(cursor.block()).language
+		if word != None and len(word) > 2 and not self.speller.check(word, \
+			language) and self.quiedit.speller_suggest:
+			self.suggest_alternatives(word)
 
 	def suggest_alternatives(self, word=None):
 
@@ -275,11 +520,14 @@ class quieditor(QtGui.QTextEdit):
 		word -- the word to suggest or None for the current word
 		"""
 
+		if not hasattr(self, u'speller'):
+			return
 		if word == None:
 			word = self.current_word()
 		if word == None:
 			self.quiedit.set_status("No suggestions")
-		suggestions = self.speller.suggest(word)
+		suggestions = self.speller.suggest(word, highlighter.get_block_data( \
+			self.textCursor().block()).language)
 		if len(suggestions) > 0:
 			self.quiedit.set_status(u"Did you mean: " + (u", ".join( \
 				suggestions)))
@@ -288,38 +536,169 @@ class quieditor(QtGui.QTextEdit):
 
 		"""Add the currently selected word to the ignore list"""
 
+		if not hasattr(self, u'speller'):
+			return
 		word = self.current_word()
 		if word == None:
 			return
 		word = word.lower()
 		if word not in self.quiedit.speller_ignore:
 			self.quiedit.speller_ignore.append(word)
+			self.speller.clear_cache()
 			self.quiedit.set_status(u"Remembering '%s'" % word)
 			self.check_entire_document()
 		else:
 			self.quiedit.set_status(u"Already know '%s'" % word)
 
-	def perform_search(self):
+	def perform_search(self, incremental=False):
 
-		"""Perform a text search"""
+		"""
+		Selects the next match of the search term, and highlights all visible
+		matches.
+
+		Keyword arguments:
+		incremental	--	Indicates whether the search term is being typed. If
+						so, the search starts at the current match, so that it
+						is kept if it still matches. (default=False)
+		"""
 
+		self.quiedit.search_edit.timer.stop()
 		term = unicode(self.quiedit.search_edit.text())
-		if not self.find(term):
-			self.moveCursor(QtGui.QTextCursor.Start)
-			if not self.find(term):
+		try:
+			matches = self.search.find(term, \
+				self.quiedit.search_case_sensitive, \
+				self.quiedit.search_whole_word, self.quiedit.search_regex)
+		except re.error as e:
+			self.setExtraSelections([])
+			self.quiedit.set_status(u"Invalid expression: %s" % e)
+			return
+		if len(matches) == 0:
+			self.setExtraSelections([])
+			if term != u"":
 				self.quiedit.set_status(u"Text not found")
+			return
+		cursor = self.textCursor()
+		if incremental:
+			i = self.search.index(cursor.selectionStart())
+		else:
+			i = self.search.index(cursor.selectionEnd())
+		start, end = matches[i]
+		cursor.setPosition(start)
+		cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+		self.setTextCursor(cursor)
+		self.quiedit.set_status(u"Match %d of %d" % (i + 1, len(matches)))
+		self.highlight_matches()
+
+	def replace(self, term, replacement, replace_all=False):
+
+		"""
+		Replaces the next match of a search term, or all matches, using the
+		search options. All replacements are a single edit, so that they can be
+		undone in one step.
+
+		Arguments:
+		term		--	The search term.
+		replacement	--	The replacement text.
+
+		Keyword arguments:
+		replace_all	--	Indicates whether all matches should be replaced, or
+						only the next match. (default=False)
+		"""
+
+		if self.loading:
+			return
+		t0 = time.time()
+		options = self.quiedit.search_case_sensitive, \
+			self.quiedit.search_whole_word, self.quiedit.search_regex
+		try:
+			replacements = self.search.replacements(term, replacement, \
+				*options)
+		except re.error as e:
+			self.quiedit.set_status(u"Invalid expression: %s" % e)
+			return
+		if len(replacements) == 0:
+			self.quiedit.set_status(u"Text not found")
+			return
+		if not replace_all:
+			self.search.find(term, *options)
+			i = self.search.index(self.textCursor().selectionStart())
+			replacements = replacements[i:i+1]
+		# Replace from last to first, so that the positions of the remaining
+		# matches are not affected
+		cursor = QtGui.QTextCursor(self.document())
+		cursor.beginEditBlock()
+		for start, end, text in reversed(replacements):
+			cursor.setPosition(start)
+			cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+			cursor.insertText(text)
+		cursor.endEditBlock()
+		if not replace_all:
+			self.setTextCursor(cursor)
+		if len(replacements) == 1:
+			self.quiedit.set_status(u"Replaced 1 occurrence")
+		else:
+			self.quiedit.set_status(u"Replaced %d occurrences" \
+				% len(replacements))
+		if self.quiedit.debug:
+			print(u'quieditor.replace(): %d replacements in %.1f ms' \
+				% (len(replacements), 1000 * (time.time() - t0)))
+
+	def highlight_matches(self):
+
+		"""
+		Highlights the matches of the last search that are visible in the
+		viewport.
+		"""
+
+		if not self.quiedit.search_box.isVisible() or \
+			self.search.key == None or \
+			self.search.key[0] != self.text_revision:
+			return
+		start = self.cursorForPosition(QtCore.QPoint(0, 0)).position()
+		end = self.cursorForPosition(QtCore.QPoint(self.viewport().width(), \
+			self.viewport().height())).position()
+		fmt = QtGui.QTextCharFormat()
+		fmt.setForeground(QtGui.QColor( \
+			self.quiedit._theme.theme[u"highlight_foreground"]))
+		fmt.setBackground(QtGui.QColor( \
+			self.quiedit._theme.theme[u"highlight_background"]))
+		selections = []
+		for _start, _end in self.search.visible(start, end):
+			selection = QtGui.QTextEdit.ExtraSelection()
+			selection.cursor = self.textCursor()
+			selection.cursor.setPosition(_start)
+			selection.cursor.setPosition(_end, QtGui.QTextCursor.KeepAnchor)
+			selection.format = fmt
+			selections.append(selection)
+		self.setExtraSelections(selections)
 
 	def show_stats(self):
 
-		"""Show document statistics"""
+		"""
+		Show document statistics. The statistics of the document are kept up to
+		date while editing, so only a selection needs to be counted.
+		"""
 
-		#s = unicode(self.toPlainText())
-		s = self.get_selection()
-		word_count = len(s.split())
-		line_count = len(s.split(u"\n"))
-		char_count = len(s)
-		self.quiedit.set_status(u"%d words, %d lines and %d characters" \
-			% (word_count, line_count, char_count))
+		tc = self.textCursor()
+		if tc.hasSelection():
+			s = unicode(tc.selectedText()).replace(u"\u2029", u"\n")
+			msg = u"%d words, %d lines and %d characters" % (len(s.split()), \
+				len(s.split(u"\n")), len(s))
+		else:
+			msg = u"%s, %d words in this section" % (self.stats.summary(), \
+				self.stats.section_words(tc.blockNumber()))
+		if self is self.quiedit.editor:
+			msg += u" | " + self.quiedit.session.summary()
+		# Show cache statistics in debug mode
+		if self.quiedit.debug:
+			if isinstance(self.highlighter, highlighter.MarkdownHighlighter):
+				msg += u" | highlighter cache: %d hits, %d misses" \
+					% self.highlighter.cache_info()
+			if hasattr(self, u'speller'):
+				msg += u" | speller cache: %d hits, %d misses, %d cached" \
+					% self.speller.cache_info()
+			print(u'quieditor.show_stats(): %s' % msg)
+		self.quiedit.set_status(msg)
 
 	def set_anchor(self):
 
@@ -339,33 +718,218 @@ class quieditor(QtGui.QTextEdit):
 		else:
 			self.quiedit.set_status(u'No anchor set')
 
-	def set_keybindings(self):
+	def register_action(self, name, func):
 
 		"""
-		Compiles Python code to handle keybindings
+		Registers a function that is called when the keybinding with the given
+		name is pressed. Actions that are registered later replace earlier
+		actions with the same name.
 
 		Arguments:
-		A string containing the keybindings
-		"""
-
-		self.keybindings = {}
-		for l in open(self.quiedit.get_resource(u"keybindings.conf")):
-			a = l.split("=")
-			if len(a) == 2:
-				function = a[0].strip()
-				mods = 0
-				for key in a[1].strip().split(u"+"):
-					if hasattr(QtCore.Qt, u"%sModifier" % key.capitalize()):
-						mods = mods | eval(u"QtCore.Qt.%sModifier" % \
-							key.capitalize())
-					else:
-						try:
-							key = eval(u"QtCore.Qt.Key_%s" % key.capitalize())
-						except:
-							print( \
-								u"quieditor.set_keybindings(): unkown key in '%s'" \
-								% l)
-				self.keybindings[function] = key, mods
+		name	--	The name of the keybinding, as in keybindings.conf.
+		func	--	A function that takes no arguments, and returns True if the
+					keypress should not be processed any further.
+		"""
+
+		self.actions[name] = func
+
+	def register_default_actions(self):
+
+		"""Registers the built-in actions."""
+
+		self.actions = {}
+		for name in dir(self):
+			if name.startswith(u'action_'):
+				self.register_action(name[7:], getattr(self, name))
+
+	def action_quit(self):
+
+		"""Quit the program"""
+
+		self.quiedit.close()
+		return True
+
+	def action_open(self):
+
+		"""Open a file"""
+
+		self.quiedit.open_file()
+		return True
+
+	def action_save(self):
+
+		"""Save a file"""
+
+		self.quiedit.save_file()
+		return True
+
+	def action_save_as(self):
+
+		"""Save a file as"""
+
+		self.quiedit.save_file(always_ask=True)
+		return True
+
+	def action_new(self):
+
+		"""New file"""
+
+		self.quiedit.new_file()
+		return True
+
+	def action_bold(self):
+
+		"""Make bold"""
+
+		self.format_selection(u'__')
+		return True
+
+	def action_italic(self):
+
+		"""Make italics"""
+
+		self.format_selection(u'*')
+		return True
+
+	def action_set_anchor(self):
+
+		"""Set anchor"""
+
+		self.set_anchor()
+		return True
+
+	def action_jump_anchor(self):
+
+		"""Jump anchor"""
+
+		self.jump_anchor()
+		return True
+
+	def action_command(self):
+
+		"""Toggle the command box (only in edit mode)"""
+
+		if not self.quiedit.editor.isVisible():
+			return False
+		if self.quiedit.command_box.isVisible():
+			self.quiedit.command_box.hide()
+			self.setFocus()
+		else:
+			self.quiedit.command_box.show()
+			self.quiedit.command_edit.setFocus()
+		return True
+
+	def action_find(self):
+
+		"""Toggle find (only in edit mode)"""
+
+		if not self.quiedit.editor.isVisible():
+			return False
+		if self.quiedit.search_box.isVisible():
+			self.quiedit.search_box.hide()
+			self.setFocus()
+		else:
+			self.quiedit.search_box.show()
+			self.quiedit.search_edit.setFocus()
+		return True
+
+	def action_help(self):
+
+		"""Toggle help"""
+
+		if self.quiedit.help.isVisible():
+			self.quiedit.show_element(u"editor")
+			self.quiedit.set_status(u"Resuming")
+		else:
+			self.quiedit.show_element(u"help")
+			self.quiedit.set_status(u"Press Control+H to resume editing")
+		return True
+
+	def action_prefs(self):
+
+		"""Toggle preferences"""
+
+		self.quiedit.show_element(u"prefs")
+		self.quiedit.setCursor(QtCore.Qt.ArrowCursor)
+		self.quiedit.set_status(u"Opening preferences")
+		return True
+
+	def action_preview_markdown(self):
+
+		"""Toggle markdown"""
+
+		if self.quiedit._markdown.isVisible():
+			self.quiedit.show_element(u"editor")
+			self.quiedit.set_status(u"Resuming")
+		else:
+			self.quiedit._markdown.refresh()
+			self.quiedit.show_element(u"markdown")
+			self.quiedit.setCursor(QtCore.Qt.ArrowCursor)
+			self.quiedit.set_status(u"Previewing markdown")
+		return True
+
+	def action_live_preview(self):
+
+		"""Toggle live preview"""
+
+		self.quiedit.toggle_live_preview()
+		return True
+
+	def action_fullscreen(self):
+
+		"""Toggle fullscreen"""
+
+		if self.quiedit.isFullScreen():
+			self.quiedit.showNormal()
+			self.quiedit.resize(QtCore.QSize(self.quiedit.width, \
+				self.quiedit.height))
+		else:
+			self.quiedit.showFullScreen()
+		return False
+
+	def action_ignore(self):
+
+		"""Ignore current word"""
+
+		self.ignore_current_word()
+		return True
+
+	def action_suggest(self):
+
+		"""Suggest alternatives"""
+
+		self.suggest_alternatives()
+		return True
+
+	def action_stats(self):
+
+		"""Show document statistics"""
+
+		self.show_stats()
+		return True
+
+	def action_scroll_up(self):
+
+		"""Scroll up"""
+
+		self.verticalScrollBar().setValue(self.verticalScrollBar().value() - \
+			2*self.quiedit._theme.theme[u'font_size'])
+		return False
+
+	def action_scroll_down(self):
+
+		"""Scroll down"""
+
+		self.verticalScrollBar().setValue(self.verticalScrollBar().value() + \
+			2*self.quiedit._theme.theme[u'font_size'])
+		return False
+
+	def set_keybindings(self):
+
+		"""Loads the keybindings, which are shared by all editors."""
+
+		self.keybindings, self.keymap = keymap.load( \
+			self.quiedit.get_resource(u"keybindings.conf"))
 
 	def set_text(self, text):
 
@@ -395,204 +959,64 @@ class quieditor(QtGui.QTextEdit):
 	def keyPressEvent(self, event):
 
 		"""
-		Handle keypress events
+		Handle keypress events. This is called for every keystroke, so it
+		should not do any work that is not needed for the key at hand.
 
 		Arguments:
 		event -- a QKeyEvent
 		"""
 
+		t0 = time.time()
+		key = event.key()
 		intercept = False # Set to True to disable the regular keyPressEvent
-		had_selection = self.textCursor().hasSelection()
+		cursor = self.textCursor()
+		had_selection = cursor.hasSelection()
 
 		# Check for keybindings if a modifier was pressed
 		if event.modifiers() != QtCore.Qt.NoModifier:
-
-			# Quit the program
-			if self.keybinding_match(event, u"quit"):
-				self.quiedit.close()
-				intercept = True
-
-			# Open a file
-			elif self.keybinding_match(event, u"open"):
-				self.quiedit.open_file()
-				intercept = True
-
-			# Save a file
-			elif self.keybinding_match(event, u"save"):
-				self.quiedit.save_file()
-				intercept = True
-
-			# Save a file as
-			elif self.keybinding_match(event, u"save_as"):
-				self.quiedit.save_file(always_ask=True)
-				intercept = True
-
-			# New file
-			elif self.keybinding_match(event, u"new"):
-				self.quiedit.new_file()
-				intercept = True
-
-			# Make bold
-			elif self.keybinding_match(event, u"bold"):
-				intercept = True
-				self.format_selection(u'__')
-
-			# Make italics
-			elif self.keybinding_match(event, u"italic"):
-				intercept = True
-				self.format_selection(u'*')
-
-			# Set anchor
-			elif self.keybinding_match(event, u"set_anchor"):
-				intercept = True
-				self.set_anchor()
-
-			# Jump anchor
-			elif self.keybinding_match(event, u"jump_anchor"):
-				intercept = True
-				self.jump_anchor()
-
-			# Make italics
-			elif self.keybinding_match(event, u'command') and \
-				self.quiedit.editor.isVisible():
-				if self.quiedit.command_box.isVisible():
-					self.quiedit.command_box.hide()
-					self.setFocus()
-				else:
-					self.quiedit.command_box.show()
-					self.quiedit.command_edit.setFocus()
-				intercept = True
-
-			# Toggle find (only in edit mode)
-			elif self.keybinding_match(event, u"find") and \
-				self.quiedit.editor.isVisible():
-				if self.quiedit.search_box.isVisible():
-					self.quiedit.search_box.hide()
-					self.setFocus()
-				else:
-					self.quiedit.search_box.show()
-					self.quiedit.search_edit.setFocus()
-				intercept = True
-
-			# Toggle help
-			elif self.keybinding_match(event, u"help"):
-				intercept = True
-				if self.quiedit.help.isVisible():
-					self.quiedit.show_element(u"editor")
-					self.quiedit.set_status(u"Resuming")
-				else:
-					self.quiedit.show_element(u"help")
-					self.quiedit.set_status(u"Press Control+H to resume editing")
-
-			# Toggle preferences
-			elif self.keybinding_match(event, u"prefs"):
-				intercept = True
-				self.quiedit.show_element(u"prefs")
-				self.quiedit.setCursor(QtCore.Qt.ArrowCursor)
-				self.quiedit.set_status(u"Opening preferences")
-
-			# Toggle markdown
-			elif self.keybinding_match(event, u"preview_markdown"):
-				intercept = True
-				if self.quiedit._markdown.isVisible():
-					self.quiedit.show_element(u"editor")
-					self.quiedit.set_status(u"Resuming")
-				else:
-					self.quiedit._markdown.refresh()
-					self.quiedit.show_element(u"markdown")
-					self.quiedit.setCursor(QtCore.Qt.ArrowCursor)
-					self.quiedit.set_status(u"Previewing markdown")
-
-			# Toggle fullscreen
-			elif self.keybinding_match(event, u"fullscreen"):
-				if self.quiedit.isFullScreen():
-					self.quiedit.showNormal()
-					self.quiedit.resize(QtCore.QSize(self.quiedit.width, \
-						self.quiedit.height))
-				else:
-					self.quiedit.showFullScreen()
-
-			# Ignore current word
-			elif self.keybinding_match(event, u"ignore"):
-				self.ignore_current_word()
-				intercept = True
-
-			# Suggest alternatives
-			elif self.keybinding_match(event, u"suggest"):
-				self.suggest_alternatives()
-				intercept = True
-
-			# Show document statistics
-			elif self.keybinding_match(event, u"stats"):
-				self.show_stats()
-				intercept = True
-
-			# Scroll keybindings
-			elif self.keybinding_match(event, u'scroll_up'):
-				self.verticalScrollBar().setValue( \
-					self.verticalScrollBar().value()- \
-					2*self.quiedit._theme.theme[u'font_size'])
-			elif self.keybinding_match(event, u'scroll_down'):
-				self.verticalScrollBar().setValue( \
-					self.verticalScrollBar().value()+ \
-					2*self.quiedit._theme.theme[u'font_size'])
+			name = self.keymap.get((key, int(event.modifiers())))
+			if name in self.actions:
+				intercept = self.actions[name]()
 
 		# A hack to automatically unindent the tab indent on a backspace
-		if self.quiedit.auto_indent and (self.key_match(event, \
-			QtCore.Qt.Key_Backspace)\
-			or self.key_match(event, QtCore.Qt.Key_Left)):
-
-			cursor = self.textCursor()
-			cursor.movePosition(QtGui.QTextCursor.Left, \
-				QtGui.QTextCursor.KeepAnchor, 1)
-			unindent = True
-			for i in cursor.selectedText().toLatin1():
-				if ord(i) != self.quiedit.ord_indent:
-					unindent = False
-					break
-			if unindent:
-				if self.key_match(event, QtCore.Qt.Key_Backspace):
-					cursor.removeSelectedText()
-				else:
-					self.moveCursor(QtGui.QTextCursor.StartOfLine)
+		if self.quiedit.auto_indent and key in self.unindent_keys and \
+			not had_selection and cursor.position() > 0 and \
+			self.document().characterAt(cursor.position() - 1).unicode() \
+			== self.quiedit.ord_indent:
+			if key == QtCore.Qt.Key_Backspace:
+				cursor.deletePreviousChar()
+			else:
+				self.moveCursor(QtGui.QTextCursor.StartOfLine)
 
 		# Process the keypress in the regular way
 		if not intercept:
 			super(quieditor, self).keyPressEvent(event)
 
 		# A hack to automatically delete the tab indent on a delete
-		if self.quiedit.auto_indent and (self.key_match(event, \
-			QtCore.Qt.Key_Delete)\
-			or self.key_match(event, QtCore.Qt.Key_Right)\
-			or self.key_match(event, QtCore.Qt.Key_Down)\
-			or self.key_match(event, QtCore.Qt.Key_Up)):
-
+		if self.quiedit.auto_indent and key in self.skip_indent_keys:
 			cursor = self.textCursor()
-			cursor.movePosition(QtGui.QTextCursor.Right, \
-				QtGui.QTextCursor.KeepAnchor, 1)
-			unindent = True
-			for i in cursor.selectedText().toLatin1():
-				if ord(i) != self.quiedit.ord_indent:
-					unindent = False
-					break
-			if unindent:
-				if self.key_match(event, QtCore.Qt.Key_Delete):
-					cursor.removeSelectedText()
+			if not cursor.hasSelection() and self.document().characterAt( \
+				cursor.position()).unicode() == self.quiedit.ord_indent:
+				if key == QtCore.Qt.Key_Delete:
+					cursor.deleteChar()
 				else:
 					self.moveCursor(QtGui.QTextCursor.NextWord)
 
 		# Optionally start each newline with a tab indent
-		if self.quiedit.auto_indent and self.key_match(event, \
-			QtCore.Qt.Key_Return):
-			#self.insertHtml(self.quiedit.indent_str)
+		if self.quiedit.auto_indent and key == QtCore.Qt.Key_Return:
 			self.insertPlainText(self.quiedit.str_indent)
 
-		# Optionally do spellchecking
-		if self.quiedit.speller_enabled and (had_selection
-			or self.key_match(event, QtCore.Qt.Key_Space) \
-			or self.key_match(event, QtCore.Qt.Key_Backspace) \
-			or self.key_match(event, QtCore.Qt.Key_Delete)):
-			QtCore.QTimer.singleShot(0, self.check_current_word)
+		# Optionally do spellchecking. Repeated keystrokes restart the timer,
+		# so that the word is checked once the event queue is empty.
+		if self.quiedit.speller_enabled and (had_selection or key in \
+			self.spelling_keys):
+			self.word_timer.start()
+
+		if self.quiedit.debug:
+			latency = 1000 * (time.time() - t0)
+			if latency > self.quiedit.keypress_budget:
+				print(u'quieditor.keyPressEvent(): key %d took %.1f ms' \
+					% (key, latency))
 
 	def canInsertFromMimeData(self, mimeData):
 
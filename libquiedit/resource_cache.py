@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import cPickle as pickle
+from libquiedit import saver
+
+# Changing this invalidates existing caches
+cache_format = 1
+
+# The path of the on-disk cache, and the compiled resources by key. Each entry
+# is a (source path, source mtime, compiled resource) tuple. The compiled
+# resources are shared by all callers.
+_path = None
+_entries = {}
+
+def set_path(path):
+
+	"""
+	Enables the on-disk cache, and reads the resources that are stored in it.
+
+	Arguments:
+	path		--	The path to the cache file.
+	"""
+
+	global _path
+	_path = path
+	if not os.path.exists(path):
+		return
+	try:
+		with open(path, u'rb') as f:
+			_format, entries = pickle.load(f)
+	except Exception as e:
+		print(u'resource_cache.set_path(): failed to read %s: %s' % (path, e))
+		return
+	if _format != cache_format:
+		return
+	for key, entry in entries.items():
+		_entries.setdefault(key, entry)
+
+def load(key, path, compiler):
+
+	"""
+	Loads a compiled resource from the cache, and compiles it again if the
+	source file has been modified since it was cached.
+
+	Arguments:
+	key			--	A unique name for the resource.
+	path		--	The path to the source file.
+	compiler	--	A function that takes the path to the source file, and
+					returns the compiled resource, which must be picklable.
+
+	Returns:
+	The compiled resource. This is shared and should not be modified.
+	"""
+
+	mtime = os.path.getmtime(path)
+	if key in _entries and _entries[key][:2] == (path, mtime):
+		return _entries[key][2]
+	resource = compiler(path)
+	_entries[key] = path, mtime, resource
+	if _path != None:
+		try:
+			saver.write_atomic(_path, pickle.dumps((cache_format, _entries), \
+				pickle.HIGHEST_PROTOCOL))
+		except Exception as e:
+			print(u'resource_cache.load(): failed to write %s: %s' % (_path, \
+				e))
+	return resource
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+from PyQt4 import QtCore
+
+# Flags for MoveFileEx() on Windows
+MOVEFILE_REPLACE_EXISTING = 0x1
+MOVEFILE_WRITE_THROUGH = 0x8
+
+def replace(src, dst):
+
+	"""
+	Renames a file, replacing the destination file if it exists. The
+	destination file is left untouched if the rename fails. On Windows,
+	os.rename() does not replace existing files, so MoveFileEx() is used
+	instead, unless os.replace() is available.
+
+	Arguments:
+	src			--	The file to rename.
+	dst			--	The new name of the file.
+	"""
+
+	if hasattr(os, u'replace'):
+		os.replace(src, dst)
+	elif os.name == u'nt':
+		import ctypes
+		if not ctypes.windll.kernel32.MoveFileExW(unicode(src), unicode(dst), \
+			MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH):
+			raise ctypes.WinError()
+	else:
+		os.rename(src, dst)
+
+def write_atomic(path, data):
+
+	"""
+	Writes data to a file, such that the file is either completely written or
+	left untouched, even if the application or system crashes halfway. The data
+	is written to a temporary file in the same folder, flushed to disk, and
+	then renamed to the target file.
+
+	Arguments:
+	path		--	The file to write.
+	data		--	A byte string.
+	"""
+
+	folder = os.path.dirname(os.path.abspath(path))
+	fd, tmp_path = tempfile.mkstemp(prefix=u'.%s.' % os.path.basename(path), \
+		suffix=u'.tmp', dir=folder)
+	try:
+		with os.fdopen(fd, u'wb') as f:
+			f.write(data)
+			f.flush()
+			os.fsync(f.fileno())
+		# The temporary file is only readable by the user, so give it the
+		# permissions of the existing file, or the default permissions.
+		if os.path.exists(path):
+			shutil.copymode(path, tmp_path)
+		else:
+			umask = os.umask(0)
+			os.umask(umask)
+			os.chmod(tmp_path, 0666 & ~umask)
+		replace(tmp_path, path)
+	except:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+		raise
+	# Make sure that the rename itself is on disk
+	if os.name == u'posix':
+		fd = os.open(folder, os.O_RDONLY)
+		try:
+			os.fsync(fd)
+		finally:
+			os.close(fd)
+
+def encode(text, encoding):
+
+	"""
+	Converts the document text to the on-disk format.
+
+	Arguments:
+	text		--	A unicode string.
+	encoding	--	The file encoding.
+
+	Returns:
+	A byte string.
+	"""
+
+	text = text.replace(unicode(os.linesep), u'\n')
+	if not text.endswith(u'\n'):
+		text += u'\n'
+	return text.encode(encoding)
+
+class saver(QtCore.QThread):
+
+	"""Saves a snapshot of the document in the background."""
+
+	# Emitted with the path when the file has been saved
+	saved = QtCore.pyqtSignal(unicode)
+	# Emitted with the path and an error message when saving failed
+	failed = QtCore.pyqtSignal(unicode, unicode)
+
+	def __init__(self, parent, path, text, encoding):
+
+		"""
+		Constructor.
+
+		Arguments:
+		parent		--	The parent QObject.
+		path		--	The file to write.
+		text		--	A unicode snapshot of the document.
+		encoding	--	The file encoding.
+		"""
+
+		super(saver, self).__init__(parent)
+		self.path = path
+		self.text = text
+		self.encoding = encoding
+
+	def run(self):
+
+		"""Writes the file."""
+
+		try:
+			write_atomic(self.path, encode(self.text, self.encoding))
+		except Exception as e:
+			self.failed.emit(self.path, unicode(e))
+			return
+		self.saved.emit(self.path)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import re
+import bisect
+
+class search(object):
+
+	"""
+	Finds text in an editor. The matches are found with a regular expression in
+	a plain-text snapshot of the document. Both the snapshot and the matches are
+	cached until the document or the search changes, so that stepping through
+	the matches of a large document does not scan it again.
+	"""
+
+	def __init__(self, editor):
+
+		"""
+		Constructor.
+
+		Arguments:
+		editor		--	A quieditor object.
+		"""
+
+		self.editor = editor
+		self.snapshot = u''
+		self.snapshot_revision = None
+		# The (revision, term, options) for which the matches were found, a
+		# list of (start, end) tuples, and a list of start positions
+		self.key = None
+		self.matches = []
+		self.starts = []
+
+	def text(self):
+
+		"""
+		Gives a plain-text snapshot of the document. The positions in the
+		snapshot correspond to the positions in the document.
+
+		Returns:
+		A unicode string.
+		"""
+
+		if self.snapshot_revision != self.editor.text_revision:
+			self.snapshot = unicode(self.editor.toPlainText())
+			self.snapshot_revision = self.editor.text_revision
+		return self.snapshot
+
+	def expression(self, term, case_sensitive=False, whole_word=False, \
+		regex=False):
+
+		"""
+		Compiles a search term into a regular expression.
+
+		Arguments:
+		term			--	The search term.
+
+		Keyword arguments:
+		case_sensitive	--	Indicates whether the case should match.
+							(default=False)
+		whole_word		--	Indicates whether only whole words should match.
+							(default=False)
+		regex			--	Indicates whether the term is a regular
+							expression. (default=False)
+
+		Returns:
+		A compiled regular expression. An re.error is raised if the term is not
+		a valid regular expression.
+		"""
+
+		if not regex:
+			term = re.escape(term)
+		if whole_word:
+			term = ur'\b(?:%s)\b' % term
+		flags = re.UNICODE | re.MULTILINE
+		if not case_sensitive:
+			flags |= re.IGNORECASE
+		return re.compile(term, flags)
+
+	def find(self, term, case_sensitive=False, whole_word=False, regex=False):
+
+		"""
+		Finds all matches of a search term. See expression() for the arguments.
+
+		Returns:
+		A list of (start, end) tuples, sorted by position. Empty matches are
+		skipped.
+		"""
+
+		key = self.editor.text_revision, term, case_sensitive, whole_word, \
+			regex
+		if key == self.key:
+			return self.matches
+		matches = []
+		if term != u'':
+			for m in self.expression(term, case_sensitive, whole_word, \
+				regex).finditer(self.text()):
+				if m.end() > m.start():
+					matches.append(m.span())
+		self.matches = matches
+		self.starts = [start for start, end in matches]
+		self.key = key
+		return matches
+
+	def replacements(self, term, replacement, case_sensitive=False, \
+		whole_word=False, regex=False):
+
+		"""
+		Determines how all matches of a search term should be replaced. See
+		expression() for the keyword arguments.
+
+		Arguments:
+		term		--	The search term.
+		replacement	--	The replacement text. For regular expressions, this
+						can refer to groups, such as \\1.
+
+		Returns:
+		A list of (start, end, text) tuples, in the same order as the matches
+		that are returned by find().
+		"""
+
+		replacements = []
+		if term == u'':
+			return replacements
+		for m in self.expression(term, case_sensitive, whole_word, \
+			regex).finditer(self.text()):
+			if m.end() == m.start():
+				continue
+			if regex:
+				replacements.append((m.start(), m.end(), m.expand(replacement)))
+			else:
+				replacements.append((m.start(), m.end(), replacement))
+		return replacements
+
+	def index(self, pos):
+
+		"""
+		Gives the first match that starts at or after a position, wrapping
+		around to the first match at the end of the document.
+
+		Arguments:
+		pos		--	A position in the document.
+
+		Returns:
+		The index of the match, or None if there are no matches.
+		"""
+
+		if len(self.matches) == 0:
+			return None
+		i = bisect.bisect_left(self.starts, pos)
+		if i == len(self.matches):
+			return 0
+		return i
+
+	def visible(self, start, end):
+
+		"""
+		Gives the matches that overlap with a range of the document.
+
+		Arguments:
+		start	--	The start of the range.
+		end		--	The end of the range.
+
+		Returns:
+		A list of (start, end) tuples.
+		"""
+
+		# A match that starts before the range may still overlap with it
+		i = max(0, bisect.bisect_left(self.starts, start) - 1)
+		j = bisect.bisect_right(self.starts, end)
+		return [(_start, _end) for _start, _end in self.matches[i:j] \
+			if _end > start]
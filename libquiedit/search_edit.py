@@ -21,7 +21,16 @@ from PyQt4 import QtGui, QtCore
 
 class search_edit(QtGui.QLineEdit):
 
-	"""A simple hide-on-focus-lost edit input"""
+	"""
+	A simple hide-on-focus-lost edit input, which searches as you type
+	"""
+
+	# Maps keybinding functions onto the search options that they toggle
+	options = {
+		u"search_case" : u"search_case_sensitive",
+		u"search_word" : u"search_whole_word",
+		u"search_regex" : u"search_regex",
+		}
 
 	def __init__(self, parent):
 
@@ -34,6 +43,47 @@ class search_edit(QtGui.QLineEdit):
 
 		super(search_edit, self).__init__(parent)
 		self.quiedit = parent
+		# Searches once the user pauses typing
+		self.timer = QtCore.QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(self.quiedit.search_delay)
+		self.timer.timeout.connect(self.search)
+		self.textChanged.connect(self.schedule_search)
+
+	def schedule_search(self):
+
+		"""
+		Restarts the search timer, so that a burst of keystrokes results in a
+		single search
+		"""
+
+		self.timer.start()
+
+	def search(self):
+
+		"""Searches for the text that has been typed so far"""
+
+		self.quiedit.editor.perform_search(incremental=True)
+
+	def label(self):
+
+		"""
+		Gives the label of the search box, which includes the active options
+
+		Returns:
+		A unicode string.
+		"""
+
+		options = []
+		if self.quiedit.search_case_sensitive:
+			options.append(u"case")
+		if self.quiedit.search_whole_word:
+			options.append(u"word")
+		if self.quiedit.search_regex:
+			options.append(u"regex")
+		if len(options) == 0:
+			return u"Search:"
+		return u"Search (%s):" % u", ".join(options)
 
 	def focusOutEvent(self, event):
 
@@ -45,19 +95,27 @@ class search_edit(QtGui.QLineEdit):
 		"""
 
 		self.quiedit.search_box.hide()
+		self.quiedit.editor.setExtraSelections([])
 
 	def keyPressEvent(self, event):
 
 		"""
-		Hide on Control+F and Escape
+		Hide on Control+F and Escape, and toggle the search options
 
 		Arguments:
 		event -- a keyPressEvent
 		"""
 
+		name = self.quiedit.editor.keymap.get((event.key(), \
+			int(event.modifiers())))
 		if self.quiedit.editor.key_match(event, \
 			QtCore.Qt.Key_F, QtCore.Qt.ControlModifier) or \
 			self.quiedit.editor.key_match(event, QtCore.Qt.Key_Escape):
 			self.quiedit.search_box.hide()
+		elif name in self.options:
+			option = self.options[name]
+			setattr(self.quiedit, option, not getattr(self.quiedit, option))
+			self.quiedit.search_label.setText(self.label())
+			self.search()
 		else:
 			super(search_edit, self).keyPressEvent(event)
\ No newline at end of file
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import time
+import json
+import datetime
+from collections import deque
+from PyQt4 import QtCore
+
+class session(QtCore.QObject):
+
+	"""
+	Tracks the progress of a writing session. The number of words that have
+	been written is sampled whenever the user pauses typing, and the samples
+	are kept in a ring buffer. Only the running word count of the editor is
+	used, so the document is never scanned.
+	"""
+
+	def __init__(self, quiedit):
+
+		"""
+		Constructor.
+
+		Arguments:
+		quiedit		--	A qtquiedit object.
+		"""
+
+		super(session, self).__init__(quiedit)
+		self.quiedit = quiedit
+		self.stats = quiedit.editor.stats
+		# The number of words that have been written in this session, and the
+		# part of it that has already been added to the daily history
+		self.written = 0
+		self.stored = 0
+		self.goal_reached = False
+		self.word_count = self.stats.word_count
+		self.samples = deque([(time.time(), 0)], \
+			maxlen=self.quiedit.session_samples)
+		self.timer = QtCore.QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(self.quiedit.session_interval)
+		self.timer.timeout.connect(self.sample)
+		self.quiedit.editor.textChanged.connect(self.timer.start)
+
+	def rebase(self):
+
+		"""
+		Starts counting from the current word count. This is called when a
+		different document is loaded, so that it is not counted as written.
+		"""
+
+		self.word_count = self.stats.word_count
+
+	def sample(self):
+
+		"""Adds the words that have been written since the last sample."""
+
+		if self.quiedit.editor.loading:
+			return
+		self.written += self.stats.word_count - self.word_count
+		self.word_count = self.stats.word_count
+		self.samples.append((time.time(), self.written))
+		if not self.goal_reached and self.quiedit.session_goal > 0 and \
+			self.written >= self.quiedit.session_goal:
+			self.goal_reached = True
+			self.quiedit.set_status(u"Goal of %d words reached" \
+				% self.quiedit.session_goal)
+
+	def words_per_minute(self, window=300):
+
+		"""
+		Determines the writing speed over a recent period.
+
+		Keyword arguments:
+		window		--	The period in seconds. (default=300)
+
+		Returns:
+		The number of words per minute.
+		"""
+
+		now = time.time()
+		# Use the last sample before the period as the baseline
+		t0, written = self.samples[0]
+		for t, _written in self.samples:
+			if t > now - window:
+				break
+			t0, written = t, _written
+		return 60. * (self.written - written) / max(60., now - max(t0, \
+			now - window))
+
+	def summary(self):
+
+		"""
+		Summarizes the session.
+
+		Returns:
+		A unicode string.
+		"""
+
+		msg = u"%d words this session, %.0f words/min" % (self.written, \
+			self.words_per_minute())
+		if self.quiedit.session_goal > 0:
+			msg += u", %.0f%% of goal" % (100. * self.written \
+				/ self.quiedit.session_goal)
+		return msg
+
+	def store(self, settings):
+
+		"""
+		Adds the words that have been written today to the daily history.
+
+		Arguments:
+		settings	--	A QSettings object.
+		"""
+
+		self.sample()
+		history = self.history(settings)
+		today = datetime.date.today().isoformat()
+		history[today] = history.get(today, 0) + self.written - self.stored
+		self.stored = self.written
+		# Only keep the most recent days
+		days = sorted(history)[-self.quiedit.session_history_days:]
+		settings.setValue(u"session_history", json.dumps(dict((day, \
+			history[day]) for day in days)))
+
+	def history(self, settings):
+
+		"""
+		Gets the daily history.
+
+		Arguments:
+		settings	--	A QSettings object.
+
+		Returns:
+		A dictionary that maps ISO dates onto the number of words written.
+		"""
+
+		try:
+			return json.loads(unicode(settings.value(u"session_history", \
+				u"{}").toString()))
+		except ValueError:
+			return {}
@@ -20,11 +20,32 @@ along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
 import sys
 import os
 import os.path
+import re
+import threading
+from collections import OrderedDict
+from PyQt4 import QtCore
 from PyQt4.QtCore import QString
+from libquiedit import speller_loader, verdict_store
 
-class speller:
+# Matches words, including words with internal apostrophes such as "don't"
+word_re = re.compile(ur"\w+(?:'\w+)*", re.UNICODE)
+# Matches a YAML front-matter block at the start of the document
+front_matter_re = re.compile(ur"\A---[ \t]*\n(.*?)^(?:---|\.\.\.)[ \t]*$", \
+	re.UNICODE | re.MULTILINE | re.DOTALL)
+# Matches a language hint, which is a 'lang:' key in the front matter
+lang_re = re.compile(ur"^\s*lang:\s*([\w-]+)\s*$", re.UNICODE | re.MULTILINE)
 
-	"""A basic spelling checker, currently wraps around pyhunspell."""
+class speller(QtCore.QObject):
+
+	"""
+	A basic spelling checker, currently wraps around pyhunspell. Several
+	dictionaries can be used at once, in which case the language of each
+	paragraph is guessed. The dictionaries are loaded in the background, and
+	all words are considered correct until they have been loaded.
+	"""
+
+	# Emitted when the dictionaries have been loaded
+	ready = QtCore.pyqtSignal()
 
 	ignore_chars = u' \t\n\r`~!@#$%^&*()-=_+[]\\{}|;\':",./<>?°'
 
@@ -37,23 +58,69 @@ class speller:
 		quiedit -- a qtquiedit instance
 		"""
 
+		super(speller, self).__init__()
 		self.quiedit = quiedit
-		_dic = os.path.join(self.quiedit.hunspell_path, \
-			self.quiedit.hunspell_dict) + u".dic"
-		_aff = os.path.join(self.quiedit.hunspell_path, \
-			self.quiedit.hunspell_dict) + u".aff"
-		try:
-			import hunspell
-			self.hunspell = hunspell.HunSpell(_dic, _aff)
-		except:
-			if self.quiedit.debug:
-				print( \
-					u"libquiedit.speller.__init__(): failed to load hunspell")
-			self.hunspell = None
-		if self.hunspell != None:
-			self.enc = self.hunspell.get_dic_encoding()
-
-	def check(self, word):
+		self.cache = OrderedDict()
+		self.lock = threading.Lock()
+		self.cache_hits = 0
+		self.cache_misses = 0
+		# Maps dictionary names onto (hunspell, encoding) tuples, and the name
+		# of the dictionary that is used by default
+		self.dictionaries = {}
+		self.default = None
+		self.loading = True
+		# hunspell_dict is a comma-separated list of dictionary names, the
+		# first of which is the default
+		self.names = [name.strip() for name in \
+			self.quiedit.hunspell_dict.split(u",") if name.strip() != u""]
+		# Verdicts from earlier sessions are loaded together with the
+		# dictionaries
+		self.stores = {}
+		for name in self.names:
+			path = os.path.join(self.quiedit.hunspell_path, name)
+			self.stores[name] = verdict_store.verdict_store(os.path.join( \
+				self.quiedit.user_folder(), u"verdicts.db"), name, \
+				path + u".dic", path + u".aff", self.quiedit.debug)
+		self.loader = speller_loader.speller_loader(self.quiedit, \
+			[self.stores[name] for name in self.names])
+		self.loader.finished.connect(self.loaded)
+		self.loader.start(QtCore.QThread.LowPriority)
+
+	def loaded(self):
+
+		"""
+		Is called when the dictionaries have been loaded, or failed to load.
+		"""
+
+		with self.lock:
+			for name in self.names:
+				if name in self.loader.dictionaries:
+					_hunspell = self.loader.dictionaries[name]
+					self.dictionaries[name] = _hunspell, \
+						_hunspell.get_dic_encoding()
+					if self.default == None:
+						self.default = name
+			self.cache.clear()
+			self.loading = False
+		if self.default != None:
+			self.ready.emit()
+
+	def flush(self):
+
+		"""Writes the new verdicts to the stores."""
+
+		for store in self.stores.values():
+			with self.lock:
+				verdicts = store.take_pending()
+			store.write(verdicts)
+
+	def wait(self):
+
+		"""Waits until the dictionaries have been loaded."""
+
+		self.loader.wait()
+
+	def check(self, word, language=None):
 
 		"""
 		Checks if a word is spelled correctly.
@@ -61,18 +128,127 @@ class speller:
 		Arguments:
 		word		--	The word to check.
 
+		Keyword arguments:
+		language	--	The name of the dictionary to use, or None to use the
+						default dictionary. (default=None)
+
 		Returns:
 		True if correct, False otherwise.
 		"""
 
 		word = word.strip(self.ignore_chars)
-		if self.hunspell == None:
-			return True
-		correct = self.hunspell.spell(word.encode(self.enc, u'ignore')) or \
-			word.lower() in self.quiedit.speller_ignore
+		if language not in self.dictionaries:
+			language = self.default
+			if language == None:
+				return True
+		key = language, word
+		# The speller is shared with the background spellcheck thread
+		with self.lock:
+			# Look up the verdict in the cache, and move it to the end so that
+			# the least-recently used words are evicted first.
+			try:
+				correct = self.cache.pop(key)
+				self.cache_hits += 1
+			except KeyError:
+				# Only ask hunspell about words that are not in the store
+				store = self.stores[language]
+				try:
+					correct = store.verdicts[word]
+					self.cache_hits += 1
+				except KeyError:
+					self.cache_misses += 1
+					_hunspell, enc = self.dictionaries[language]
+					correct = _hunspell.spell(word.encode(enc, u'ignore'))
+					store.add(word, correct)
+				correct = correct or word.lower() in self.quiedit.speller_ignore
+				if len(self.cache) >= self.quiedit.speller_cache_size:
+					self.cache.popitem(last=False)
+			self.cache[key] = correct
 		return correct
 
-	def suggest(self, word):
+	def hint(self, text):
+
+		"""
+		Finds a language hint in a document, which is a 'lang:' key in the YAML
+		front matter that names one of the dictionaries.
+
+		Arguments:
+		text		--	The document text.
+
+		Returns:
+		A dictionary name, or None if there is no hint.
+		"""
+
+		front_matter = front_matter_re.match(text)
+		if front_matter == None:
+			return None
+		for m in lang_re.finditer(front_matter.group(1)):
+			if m.group(1) in self.dictionaries:
+				return m.group(1)
+		return None
+
+	def guess_language(self, text, default=None):
+
+		"""
+		Guesses the language of a paragraph, by checking a sample of words
+		against each dictionary. The verdicts are cached like any other, so
+		that a guess is cheap.
+
+		Arguments:
+		text		--	The text of the paragraph.
+
+		Keyword arguments:
+		default		--	The dictionary to prefer if several dictionaries know
+						equally many words, or None to prefer the default
+						dictionary. (default=None)
+
+		Returns:
+		A dictionary name, or None if no dictionaries have been loaded.
+		"""
+
+		if default not in self.dictionaries:
+			default = self.default
+		if len(self.dictionaries) < 2:
+			return default
+		sample = []
+		for m in word_re.finditer(text):
+			if len(m.group()) > 2:
+				sample.append(m.group())
+				if len(sample) >= self.quiedit.speller_language_sample:
+					break
+		best = default
+		best_hits = sum(self.check(word, default) for word in sample)
+		for language in self.names:
+			if language == default or language not in self.dictionaries:
+				continue
+			hits = sum(self.check(word, language) for word in sample)
+			if hits > best_hits:
+				best = language
+				best_hits = hits
+		return best
+
+	def clear_cache(self):
+
+		"""
+		Forgets all cached verdicts. This should be called whenever the ignore
+		list changes.
+		"""
+
+		with self.lock:
+			self.cache.clear()
+
+	def cache_info(self):
+
+		"""
+		Gives statistics about the verdict cache.
+
+		Returns:
+		A (hits, misses, size) tuple.
+		"""
+
+		return self.cache_hits, self.cache_misses, len(self.cache)
+
+	def suggest(self, word, language=None):
 
 		"""
 		Suggests alternatives to a word.
@@ -80,16 +256,24 @@ class speller:
 		Arguments:
 		word		--	The word to offer suggestions for.
 
+		Keyword arguments:
+		language	--	The name of the dictionary to use, or None to use the
+						default dictionary. (default=None)
+
 		Returns:
 		A list of suggestions.
 		"""
 
 		word = word.strip(self.ignore_chars)
-		if self.hunspell == None:
-			return [u"No suggestions"]
-		return [suggestion.decode(self.enc, u'ignore') for suggestion in \
-			self.hunspell.suggest(word.encode(self.enc, u'ignore')) \
-			[:self.quiedit.speller_max_suggest]]
+		if language not in self.dictionaries:
+			language = self.default
+			if language == None:
+				return [u"No suggestions"]
+		_hunspell, enc = self.dictionaries[language]
+		with self.lock:
+			suggestions = _hunspell.suggest(word.encode(enc, u'ignore'))
+		return [suggestion.decode(enc, u'ignore') for suggestion in \
+			suggestions[:self.quiedit.speller_max_suggest]]
 
 def locate_hunspell_path():
 
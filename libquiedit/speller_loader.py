@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import time
+from PyQt4 import QtCore
+
+class speller_loader(QtCore.QThread):
+
+	"""
+	Loads hunspell dictionaries in the background, because large dictionaries
+	can take a long time to load.
+	"""
+
+	def __init__(self, quiedit, stores):
+
+		"""
+		Constructor.
+
+		Arguments:
+		quiedit		--	A qtquiedit instance, which owns the thread.
+		stores		--	A list of verdict_store objects, one for each
+						dictionary. Each store is loaded after its dictionary.
+		"""
+
+		super(speller_loader, self).__init__(quiedit)
+		self.quiedit = quiedit
+		self.stores = stores
+		# Maps dictionary names onto HunSpell objects
+		self.dictionaries = {}
+
+	def run(self):
+
+		"""Loads the dictionaries."""
+
+		for store in self.stores:
+			t0 = time.time()
+			try:
+				import hunspell
+				self.dictionaries[store.name] = hunspell.HunSpell(store.dic, \
+					store.aff)
+			except:
+				if self.quiedit.debug:
+					print(u"speller_loader.run(): failed to load %s" \
+						% store.dic)
+				continue
+			if self.quiedit.debug:
+				print(u"speller_loader.run(): loaded %s in %.0f ms" \
+					% (store.dic, 1000 * (time.time() - t0)))
+			store.load()
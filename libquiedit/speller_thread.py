@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from PyQt4 import QtCore
+from libquiedit.speller import word_re
+
+class speller_thread(QtCore.QThread):
+
+	"""
+	Checks the spelling of a snapshot of the document in the background, and
+	reports misspelled words in batches of blocks.
+	"""
+
+	# Emitted with the document revision of the snapshot and a list of
+	# (block number, text hash, misspelled, language) tuples, where misspelled
+	# is a list of (position, length) tuples relative to the start of the
+	# block, and language is the dictionary that was used.
+	misspelled = QtCore.pyqtSignal(int, list)
+
+	def __init__(self, editor, text, revision, languages):
+
+		"""
+		Constructor.
+
+		Arguments:
+		editor		--	The quieditor that owns the document.
+		text		--	A unicode snapshot of the plain-text document.
+		revision	--	The document revision of the snapshot.
+		languages	--	A list of (language, text hash) tuples with the
+						languages that have been guessed for the blocks.
+		"""
+
+		super(speller_thread, self).__init__(editor)
+		self.speller = editor.speller
+		self.language_hint = editor.language_hint
+		self.batch_size = editor.quiedit.speller_batch_size
+		self.text = text
+		self.revision = revision
+		self.languages = languages
+		self.cancelled = False
+
+	def cancel(self):
+
+		"""Stops checking as soon as possible."""
+
+		self.cancelled = True
+
+	def run(self):
+
+		"""Checks all words in the snapshot."""
+
+		batch = []
+		n = 0
+		for number, line in enumerate(self.text.split(u'\n')):
+			misspelled = []
+			# The language is only guessed again for blocks that have changed
+			text_hash = hash(line)
+			language, language_hash = None, None
+			if number < len(self.languages):
+				language, language_hash = self.languages[number]
+			if language_hash != text_hash:
+				if language == None:
+					language = self.language_hint
+				language = self.speller.guess_language(line, language)
+			for m in word_re.finditer(line):
+				if self.cancelled:
+					return
+				word = m.group()
+				if len(word) > 2 and not self.speller.check(word, language):
+					misspelled.append((m.start(), len(word)))
+				n += 1
+			batch.append((number, text_hash, misspelled, language))
+			# Only report whole blocks, so that each block is marked as checked
+			# in one go.
+			if n >= self.batch_size:
+				self.misspelled.emit(self.revision, batch)
+				batch = []
+				n = 0
+		if len(batch) > 0 and not self.cancelled:
+			self.misspelled.emit(self.revision, batch)
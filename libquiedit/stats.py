@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libquiedit import markdown_syntax
+
+class stats(object):
+
+	"""
+	Keeps running document statistics. The words and characters are counted
+	per block, and only the blocks that are touched by an edit are counted
+	again, so that the totals are always available without scanning the
+	document.
+	"""
+
+	def __init__(self, editor):
+
+		"""
+		Constructor.
+
+		Arguments:
+		editor		--	A quieditor object.
+		"""
+
+		self.editor = editor
+		self.reset()
+		self.editor.document().contentsChange.connect(self.update)
+
+	def count(self, block):
+
+		"""
+		Counts a single block.
+
+		Arguments:
+		block		--	A QTextBlock.
+
+		Returns:
+		A (words, characters, header) tuple, where header indicates whether the
+		block starts a new section.
+		"""
+
+		text = unicode(block.text())
+		return len(text.split()), len(text), \
+			markdown_syntax.section_re.match(text) != None
+
+	def recount(self, first, last):
+
+		"""
+		Counts a range of blocks.
+
+		Arguments:
+		first		--	The number of the first block.
+		last		--	The number of the last block.
+
+		Returns:
+		A (words, characters, headers) tuple of lists, with one item per block.
+		"""
+
+		words = []
+		chars = []
+		headers = []
+		block = self.editor.document().findBlockByNumber(first)
+		while block.isValid() and block.blockNumber() <= last:
+			_words, _chars, header = self.count(block)
+			words.append(_words)
+			chars.append(_chars)
+			headers.append(header)
+			block = block.next()
+		return words, chars, headers
+
+	def reset(self):
+
+		"""Counts the entire document."""
+
+		self.words, self.chars, self.headers = self.recount(0, \
+			self.editor.document().blockCount() - 1)
+		self.word_count = sum(self.words)
+		self.char_count = sum(self.chars)
+
+	def update(self, pos, removed, added):
+
+		"""
+		Updates the counts after an edit, by replacing the counts of the blocks
+		that have changed.
+
+		Arguments:
+		pos			--	The position of the change.
+		removed		--	The number of removed characters.
+		added		--	The number of added characters.
+		"""
+
+		document = self.editor.document()
+		n_blocks = document.blockCount()
+		first = document.findBlock(pos).blockNumber()
+		last = document.findBlock(pos + added).blockNumber()
+		# Changes that run up to the end of the document may point past the
+		# last block
+		if last < 0:
+			last = n_blocks - 1
+		# The blocks from first to last replace this many of the old blocks
+		n_old = last - first + 1 - n_blocks + len(self.words)
+		if first < 0 or n_old < 1 or first + n_old > len(self.words):
+			self.reset()
+			return
+		words, chars, headers = self.recount(first, last)
+		end = first + n_old
+		self.word_count += sum(words) - sum(self.words[first:end])
+		self.char_count += sum(chars) - sum(self.chars[first:end])
+		self.words[first:end] = words
+		self.chars[first:end] = chars
+		self.headers[first:end] = headers
+
+	def line_count(self):
+
+		"""
+		Gives the number of lines.
+
+		Returns:
+		An int.
+		"""
+
+		return len(self.words)
+
+	def character_count(self):
+
+		"""
+		Gives the number of characters, including newlines.
+
+		Returns:
+		An int.
+		"""
+
+		return self.char_count + len(self.words) - 1
+
+	def reading_time(self):
+
+		"""
+		Estimates the reading time of the document.
+
+		Returns:
+		The reading time in minutes.
+		"""
+
+		return float(self.word_count) / self.editor.quiedit.reading_speed
+
+	def section_words(self, number):
+
+		"""
+		Counts the words in the section that contains a block. A section starts
+		at a top-level header.
+
+		Arguments:
+		number		--	A block number.
+
+		Returns:
+		The number of words in the section.
+		"""
+
+		start = min(number, len(self.words) - 1)
+		while start > 0 and not self.headers[start]:
+			start -= 1
+		end = number + 1
+		while end < len(self.headers) and not self.headers[end]:
+			end += 1
+		return sum(self.words[start:end])
+
+	def summary(self):
+
+		"""
+		Summarizes the statistics of the document.
+
+		Returns:
+		A unicode string.
+		"""
+
+		return u"%d words, %d lines and %d characters, %.0f min read" % ( \
+			self.word_count, self.line_count(), self.character_count(), \
+			self.reading_time())
@@ -18,7 +18,7 @@ along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from PyQt4 import QtGui, QtCore
-import yaml
+from libquiedit import resource_cache
 
 class theme(object):
 
@@ -34,15 +34,41 @@ class theme(object):
 		"""
 
 		self.editor = editor
-		self.themeDict = yaml.load(open(self.editor.get_resource( \
-			u'themes.yaml')).read())
-		self.theme = self.recTheme(self.editor.theme)
+		# The themes are resolved once, and then cached
+		self.themeDict = resource_cache.load(u'themes', \
+			self.editor.get_resource(u'themes.yaml'), self.compile_themes)
+		theme = self.editor.theme
+		if theme not in self.themeDict:
+			print(u'theme.__init__(): %s is not a valid theme' % theme)
+			theme = u'default'
+		# The theme is copied, because the cached themes are shared, whereas
+		# the theme is modified when zooming
+		self.theme = dict(self.themeDict[theme])
+
+	def compile_themes(self, path):
+
+		"""
+		Parses the themes file, and resolves the inheritance of all themes.
+
+		Arguments:
+		path	--	The path to the themes file.
+
+		Returns:
+		A dictionary that maps theme names onto dictionaries with the theme
+		information.
+		"""
+
+		import yaml
+		self.themeDict = yaml.load(open(path).read())
+		for theme in self.themeDict:
+			self.recTheme(theme)
+		return self.themeDict
 
 	def apply(self):
 
 		"""Applies the theme."""
 
-		stylesheet = u"""
+		self.stylesheet = stylesheet = u"""
 			background: %(editor_background)s;
 			color: %(font_color)s;
 			selection-color: %(editor_background)s;
@@ -65,25 +91,36 @@ class theme(object):
 		self.editor.status.setFont(self.font())
 		self.editor.status.setStyleSheet(u"color: %s;" % self.theme[ \
 			u"status_color"])
-		self.editor.central_widget.setMinimumWidth(int(self.theme[ \
-			u"editor_width"]))
-		self.editor.central_widget.setMaximumWidth(int(self.theme[ \
-			u"editor_width"]))
-		# Apply the theme to all quieditors
-		for quieditor in self.editor.editor, self.editor.help, \
-			self.editor._markdown:
-			quieditor.setStyleSheet(stylesheet)
-			if not self.theme[u"scrollbar"]:
-				quieditor.setVerticalScrollBarPolicy( \
-					QtCore.Qt.ScrollBarAlwaysOff)
-			quieditor.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
-		# Apply the theme to the preferences screen
-		self.editor.prefs.setStyleSheet(stylesheet)
+		self.editor.set_editor_width()
+		# Apply the theme to the editor, and to the components that have been
+		# built. Other components are themed when they are built.
+		for widget in [self.editor.editor] + self.editor.components.values():
+			self.apply_component(widget)
+		# The underline of misspelled words depends on the theme
+		if self.editor.editor.highlighter != None:
+			self.editor.editor.highlighter.spelling_format = \
+				self.editor.editor.speller_style()
 		# Redo spellingcheck in the editor
 		self.editor.editor.check_entire_document()
 		# Hide the cursor for the main screen
 		self.editor.setCursor(QtCore.Qt.BlankCursor)
 
+	def apply_component(self, widget):
+
+		"""
+		Applies the theme to a single component.
+
+		Arguments:
+		widget	--	A quieditor or a prefs widget.
+		"""
+
+		widget.setStyleSheet(self.stylesheet)
+		if not isinstance(widget, QtGui.QTextEdit):
+			return
+		if not self.theme[u"scrollbar"]:
+			widget.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+		widget.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+
 	def font(self):
 
 		"""
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import time
+
+# This module is imported before anything else, so this is (almost) the start
+# of the process.
+start_time = time.time()
+enabled = u'--profile-startup' in sys.argv
+phases = []
+
+def mark(phase):
+
+	"""
+	Marks the end of a startup phase.
+
+	Arguments:
+	phase		--	A description of the phase.
+	"""
+
+	if enabled:
+		phases.append((phase, time.time()))
+
+def report():
+
+	"""
+	Marks the end of startup, which is when the first frame has been shown, and
+	prints the duration of each startup phase, if profiling is enabled.
+	"""
+
+	if not enabled:
+		return
+	mark(u'first frame')
+	print(u'timing.report(): startup profile')
+	t0 = start_time
+	for phase, t in phases:
+		print(u'%8.1f ms %8.1f ms  %s' % (1000 * (t - t0), 1000 * (t - \
+			start_time), phase))
+		t0 = t
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sqlite3
+
+class verdict_store(object):
+
+	"""
+	Remembers the verdicts of hunspell across sessions in an sqlite database.
+	The verdicts are stored per dictionary, together with a fingerprint of the
+	dictionary files, so that they are forgotten when the dictionary changes.
+	Only raw hunspell verdicts are stored; the ignore list is applied by the
+	speller.
+	"""
+
+	def __init__(self, path, name, dic, aff, debug=False):
+
+		"""
+		Constructor.
+
+		Arguments:
+		path		--	The path to the database.
+		name		--	The name of the dictionary, such as 'en_US'.
+		dic			--	The path to the .dic file.
+		aff			--	The path to the .aff file.
+
+		Keyword arguments:
+		debug		--	Indicates whether debug output should be printed.
+						(default=False)
+		"""
+
+		self.path = path
+		self.name = name
+		self.dic = dic
+		self.aff = aff
+		self.debug = debug
+		self.fingerprint = None
+		# The stored verdicts, and the new verdicts that have not been written
+		# yet, as dictionaries that map words onto True or False
+		self.verdicts = {}
+		self.pending = {}
+
+	def connect(self):
+
+		"""
+		Opens the database, and creates the table if necessary. Connections
+		cannot be shared between threads, so each operation uses its own.
+
+		Returns:
+		An sqlite3 connection.
+		"""
+
+		connection = sqlite3.connect(self.path)
+		connection.execute(u'''CREATE TABLE IF NOT EXISTS verdicts (
+			dict TEXT, fingerprint TEXT, word TEXT, correct INTEGER,
+			PRIMARY KEY (dict, word))''')
+		return connection
+
+	def load(self):
+
+		"""
+		Reads the verdicts for the current dictionary. This is called from the
+		thread that loads the dictionary.
+		"""
+
+		try:
+			self.fingerprint = u'%d-%d-%d-%d' % (os.path.getmtime(self.dic), \
+				os.path.getsize(self.dic), os.path.getmtime(self.aff), \
+				os.path.getsize(self.aff))
+			connection = self.connect()
+			try:
+				self.verdicts = dict((word, bool(correct)) for word, correct \
+					in connection.execute(u'''SELECT word, correct FROM
+					verdicts WHERE dict=? AND fingerprint=?''', (self.name, \
+					self.fingerprint)))
+			finally:
+				connection.close()
+		except Exception as e:
+			print(u'verdict_store.load(): failed to read %s: %s' % (self.path, \
+				e))
+			self.fingerprint = None
+			return
+		if self.debug:
+			print(u'verdict_store.load(): %d verdicts for %s' \
+				% (len(self.verdicts), self.name))
+
+	def add(self, word, correct):
+
+		"""
+		Adds a new verdict.
+
+		Arguments:
+		word		--	The word.
+		correct		--	The verdict of hunspell.
+		"""
+
+		self.verdicts[word] = correct
+		self.pending[word] = correct
+
+	def take_pending(self):
+
+		"""
+		Gets the verdicts that have not been written yet, and forgets them.
+
+		Returns:
+		A dictionary that maps words onto verdicts.
+		"""
+
+		pending = self.pending
+		self.pending = {}
+		return pending
+
+	def write(self, verdicts):
+
+		"""
+		Writes verdicts to the database. Verdicts for other versions of the
+		dictionary are replaced.
+
+		Arguments:
+		verdicts	--	A dictionary that maps words onto verdicts.
+		"""
+
+		if self.fingerprint == None or len(verdicts) == 0:
+			return
+		try:
+			connection = self.connect()
+			try:
+				with connection:
+					connection.executemany(u'''INSERT OR REPLACE INTO verdicts
+						VALUES (?, ?, ?, ?)''', [(self.name, \
+						self.fingerprint, word, int(correct)) for word, \
+						correct in verdicts.items()])
+					connection.execute(u'''DELETE FROM verdicts WHERE dict=?
+						AND fingerprint!=?''', (self.name, self.fingerprint))
+			finally:
+				connection.close()
+		except Exception as e:
+			print(u'verdict_store.write(): failed to write %s: %s' \
+				% (self.path, e))
+			return
+		if self.debug:
+			print(u'verdict_store.write(): %d verdicts for %s' \
+				% (len(verdicts), self.name))
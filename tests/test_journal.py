@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+from PyQt4 import QtCore
+from libquiedit import journal
+
+def entry(pos, removed, added):
+
+	return json.dumps([pos, removed, added])
+
+class signal(object):
+
+	def connect(self, slot):
+
+		pass
+
+class document(object):
+
+	contentsChange = signal()
+
+class editor(object):
+
+	"""Mimics the part of quieditor that the journal uses."""
+
+	loading = False
+
+	def __init__(self):
+
+		self.text = u''
+		self._document = document()
+
+	def document(self):
+
+		return self._document
+
+	def toPlainText(self):
+
+		return self.text
+
+class window(QtCore.QObject):
+
+	"""Mimics the part of qtquiedit that the journal uses."""
+
+	journal_interval = 1000
+	journal_compact_size = 10000
+	debug = False
+
+	def __init__(self, path):
+
+		super(window, self).__init__()
+		self.path = path
+		self.editor = editor()
+
+	def journal_file(self):
+
+		return self.path
+
+def test_apply_edits():
+
+	entries = [entry(0, 0, u'# '), entry(7, 0, u'!'), entry(2, 1, u'h')]
+	assert journal.apply_edits(u'Hello', entries) == (u'# hello!', 3)
+
+def test_apply_edits_stops_at_incomplete_entry():
+
+	entries = [entry(0, 0, u'a'), b'[1, 0, "b', entry(2, 0, u'c')]
+	assert journal.apply_edits(u'', entries) == (u'a', 1)
+
+def test_apply_edits_counts_utf16_units():
+
+	# The emoji takes two UTF-16 code units, as in Qt
+	text = u'\U0001f600x'
+	assert journal.apply_edits(text, [entry(2, 1, u'y')])[0] == \
+		u'\U0001f600y'
+
+def test_difference_round_trip():
+
+	texts = [u'', u'abc', u'abXc', u'a\nb\nc', u'\U0001f600', u'\U0001f601',
+		u'x\U0001f600y', u'caf\xe9', u'abcabc', u'abc']
+	for old in texts:
+		for new in texts:
+			pos, removed, added = journal.difference(old, new)
+			assert journal.apply_edits(old, [entry(pos, removed, \
+				added)]) == (new, 1)
+
+def test_difference_is_minimal():
+
+	assert journal.difference(u'abc', u'abc') == (3, 0, u'')
+	assert journal.difference(u'abc', u'aXc') == (1, 1, u'X')
+	assert journal.difference(u'abc', u'abdc') == (2, 0, u'd')
+
+def test_difference_does_not_split_surrogate_pairs():
+
+	# The emojis share the high surrogate
+	assert journal.difference(u'\U0001f600', u'\U0001f601') == \
+		(0, 2, u'\U0001f601')
+
+def test_common_prefix():
+
+	assert journal.common_prefix(u'abcd', u'abxd') == 2
+	assert journal.common_prefix(u'', u'abc') == 0
+	assert journal.common_prefix(u'abc', u'abc') == 3
+
+def test_fingerprint_ignores_final_newline():
+
+	assert journal.fingerprint(u'abc') == journal.fingerprint(u'abc\n')
+	assert journal.fingerprint(u'abc') != journal.fingerprint(u'abd')
+
+def test_rebase_carries_over_edits_made_during_save(tmpdir):
+
+	quiedit = window(str(tmpdir.join(u'journal')))
+	j = journal.journal(quiedit)
+	quiedit.editor.text = u'old'
+	j.reset(u'a.md', u'old')
+	# The text is edited while it is being saved
+	generation = j.generation
+	quiedit.editor.text = u'saved text, edited'
+	j.rebase(u'a.md', u'saved text', generation)
+	assert j.recover(u'a.md', u'saved text') == (u'saved text, edited', 1)
+
+def test_save_then_new_file_then_saved(tmpdir):
+
+	quiedit = window(str(tmpdir.join(u'journal')))
+	j = journal.journal(quiedit)
+	quiedit.editor.text = u'old text'
+	j.reset(u'a.md', u'old text')
+	# The file is saved in the background, and a new file is started before
+	# the saver reports that it has finished
+	generation = j.generation
+	quiedit.editor.text = u''
+	j.reset(None, u'')
+	quiedit.editor.text = u'new document'
+	j.rebase(u'a.md', u'old text', generation)
+	assert j.header[u'path'] == None
+	assert j.recover(u'a.md', u'old text') == None
+	assert j.recover(None, u'') == None
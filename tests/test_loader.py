@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+from libquiedit import loader
+
+def read(data, size, encoding=u'utf-8'):
+
+	return list(loader.chunks(io.BytesIO(data), size, encoding))
+
+def test_crlf_split_across_chunks():
+
+	# The first chunk ends with the \r of a \r\n
+	data = b'abc\r\n' * 4
+	parts = read(data, 4)
+	assert u''.join(parts) == data.decode(u'utf-8')
+	for a, b in zip(parts, parts[1:]):
+		assert not (a.endswith(u'\r') and b.startswith(u'\n'))
+
+def test_crlf_file_size_multiple_of_chunk_size():
+
+	# Chunks of four bytes split every other \r\n
+	data = b'abc\r\n' * 100
+	parts = read(data, 4)
+	assert len(data) % 4 == 0
+	assert u''.join(parts) == data.decode(u'utf-8')
+	assert not any(part.endswith(u'\r') for part in parts)
+
+def test_trailing_carriage_return():
+
+	assert u''.join(read(b'abc\r', 4)) == u'abc\r'
+
+def test_multibyte_character_split_across_chunks():
+
+	text = u'caf\xe9\r\nna\xefve\r\n' * 10
+	for size in range(1, 8):
+		assert u''.join(read(text.encode(u'utf-8'), size)) == text
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libquiedit.markdown_syntax import scan, sections, STATE_NORMAL, \
+	STATE_YAML, STATE_CODE
+
+def test_scan_header():
+
+	assert scan(u'# Title') == ([(0, 7, u'h1')], STATE_NORMAL)
+	assert scan(u'## Title') == ([(0, 8, u'h2')], STATE_NORMAL)
+
+def test_scan_inline():
+
+	spans, state = scan(u'Some **bold** and *emphasis*, see @Mathot2013')
+	assert spans == [(5, 8, u'strong'), (18, 10, u'emphasis'), \
+		(34, 11, u'citation')]
+	assert state == STATE_NORMAL
+
+def test_scan_verbatim_lines():
+
+	# Code and quotations are not scanned for inline constructs
+	assert scan(u'\tcode **not bold**') == ([(0, 18, u'code')], STATE_NORMAL)
+	assert scan(u'> quote *not emphasis*') == ([(0, 22, u'quote')], \
+		STATE_NORMAL)
+
+def test_scan_fenced_code():
+
+	assert scan(u'```') == ([(0, 3, u'code')], STATE_CODE)
+	assert scan(u'# no header', STATE_CODE) == ([(0, 11, u'code')], \
+		STATE_CODE)
+	assert scan(u'```', STATE_CODE) == ([(0, 3, u'code')], STATE_NORMAL)
+
+def test_scan_yaml():
+
+	assert scan(u'%--') == ([(0, 3, u'yaml')], STATE_YAML)
+	assert scan(u'figure:', STATE_YAML) == ([(0, 7, u'yaml')], STATE_YAML)
+	assert scan(u'  source: x.png', STATE_YAML) == ([(0, 9, u'yaml')], \
+		STATE_YAML)
+	assert scan(u'--%', STATE_YAML) == ([(0, 3, u'yaml')], STATE_NORMAL)
+
+def test_sections():
+
+	text = u'# One\n\nText\n\n# Two\n\n## Three\n### Not a section'
+	assert sections(text) == [u'# One\n\nText\n\n', u'# Two\n\n', \
+		u'## Three\n### Not a section']
+
+def test_sections_skip_code():
+
+	text = u'# One\n```\n# Not a section\n```\n# Two'
+	assert sections(text) == [u'# One\n```\n# Not a section\n```\n', \
+		u'# Two']
+
+def test_sections_not_split_with_context():
+
+	# Front matter, citations and references depend on the entire document
+	for text in [u'---\ntitle: x\n---\n# One\n# Two', \
+		u'# One\n@Mathot2013\n# Two', u'# One\n%Figure\n# Two']:
+		assert sections(text) == [text]
+
+def test_sections_make_up_document():
+
+	text = u'Intro\n# One\nText\n## Two\n\n# Three\n'
+	assert u''.join(sections(text)) == text
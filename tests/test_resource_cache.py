@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+from libquiedit import resource_cache
+
+class compiler(object):
+
+	"""Counts how often a resource is compiled."""
+
+	def __init__(self):
+
+		self.calls = 0
+
+	def __call__(self, path):
+
+		self.calls += 1
+		return open(path).read().upper()
+
+def source(tmpdir, text, mtime):
+
+	path = str(tmpdir.join(u'source.txt'))
+	with open(path, u'w') as f:
+		f.write(text)
+	os.utime(path, (mtime, mtime))
+	return path
+
+def test_load_compiles_once(tmpdir, monkeypatch):
+
+	monkeypatch.setattr(resource_cache, u'_path', None)
+	monkeypatch.setattr(resource_cache, u'_entries', {})
+	path = source(tmpdir, u'abc', 1000)
+	compile_source = compiler()
+	assert resource_cache.load(u'key', path, compile_source) == u'ABC'
+	assert resource_cache.load(u'key', path, compile_source) == u'ABC'
+	assert compile_source.calls == 1
+
+def test_load_invalidates_modified_source(tmpdir, monkeypatch):
+
+	monkeypatch.setattr(resource_cache, u'_path', None)
+	monkeypatch.setattr(resource_cache, u'_entries', {})
+	compile_source = compiler()
+	path = source(tmpdir, u'abc', 1000)
+	resource_cache.load(u'key', path, compile_source)
+	path = source(tmpdir, u'def', 2000)
+	assert resource_cache.load(u'key', path, compile_source) == u'DEF'
+	assert compile_source.calls == 2
+
+def test_cache_persists(tmpdir, monkeypatch):
+
+	monkeypatch.setattr(resource_cache, u'_path', None)
+	monkeypatch.setattr(resource_cache, u'_entries', {})
+	cache = str(tmpdir.join(u'resources.cache'))
+	path = source(tmpdir, u'abc', 1000)
+	resource_cache.set_path(cache)
+	resource_cache.load(u'key', path, compiler())
+	# A new session reads the compiled resource from disk
+	monkeypatch.setattr(resource_cache, u'_entries', {})
+	resource_cache.set_path(cache)
+	compile_source = compiler()
+	assert resource_cache.load(u'key', path, compile_source) == u'ABC'
+	assert compile_source.calls == 0
+
+def test_cache_format_change_invalidates(tmpdir, monkeypatch):
+
+	monkeypatch.setattr(resource_cache, u'_path', None)
+	monkeypatch.setattr(resource_cache, u'_entries', {})
+	cache = str(tmpdir.join(u'resources.cache'))
+	path = source(tmpdir, u'abc', 1000)
+	resource_cache.set_path(cache)
+	resource_cache.load(u'key', path, compiler())
+	monkeypatch.setattr(resource_cache, u'_entries', {})
+	monkeypatch.setattr(resource_cache, u'cache_format', \
+		resource_cache.cache_format + 1)
+	resource_cache.set_path(cache)
+	compile_source = compiler()
+	resource_cache.load(u'key', path, compile_source)
+	assert compile_source.calls == 1
+
+def test_corrupt_cache_is_ignored(tmpdir, monkeypatch):
+
+	monkeypatch.setattr(resource_cache, u'_path', None)
+	monkeypatch.setattr(resource_cache, u'_entries', {})
+	cache = str(tmpdir.join(u'resources.cache'))
+	with open(cache, u'wb') as f:
+		f.write(b'not a pickle')
+	resource_cache.set_path(cache)
+	path = source(tmpdir, u'abc', 1000)
+	assert resource_cache.load(u'key', path, compiler()) == u'ABC'
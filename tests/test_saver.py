@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import stat
+from libquiedit import saver
+
+def test_write_atomic_creates_file(tmpdir):
+
+	path = str(tmpdir.join(u'new.md'))
+	saver.write_atomic(path, b'abc\n')
+	assert open(path, u'rb').read() == b'abc\n'
+
+def test_write_atomic_replaces_file(tmpdir):
+
+	path = str(tmpdir.join(u'old.md'))
+	saver.write_atomic(path, b'old\n')
+	saver.write_atomic(path, b'new\n')
+	assert open(path, u'rb').read() == b'new\n'
+	# No temporary files are left behind
+	assert os.listdir(str(tmpdir)) == [u'old.md']
+
+def test_write_atomic_keeps_permissions(tmpdir):
+
+	path = str(tmpdir.join(u'mode.md'))
+	saver.write_atomic(path, b'old\n')
+	os.chmod(path, 0640)
+	saver.write_atomic(path, b'new\n')
+	assert stat.S_IMODE(os.stat(path).st_mode) == 0640
+
+def test_write_atomic_keeps_original_on_failure(tmpdir):
+
+	path = str(tmpdir.join(u'keep.md'))
+	saver.write_atomic(path, b'old\n')
+	try:
+		# Only byte strings can be written
+		saver.write_atomic(path, None)
+	except TypeError:
+		pass
+	else:
+		assert False
+	assert open(path, u'rb').read() == b'old\n'
+	assert os.listdir(str(tmpdir)) == [u'keep.md']
+
+def test_encode():
+
+	assert saver.encode(u'caf\xe9', u'utf-8') == b'caf\xc3\xa9\n'
+	assert saver.encode(u'abc\n', u'utf-8') == b'abc\n'
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import re
+import pytest
+from libquiedit import search
+
+class editor(object):
+
+	"""Mimics the part of quieditor that search uses."""
+
+	def __init__(self, text):
+
+		self.text = text
+		self.text_revision = 0
+
+	def toPlainText(self):
+
+		return self.text
+
+	def edit(self, text):
+
+		self.text = text
+		self.text_revision += 1
+
+def test_find():
+
+	s = search.search(editor(u'Cat cat concat'))
+	assert s.find(u'cat') == [(0, 3), (4, 7), (11, 14)]
+	assert s.find(u'cat', case_sensitive=True) == [(4, 7), (11, 14)]
+	assert s.find(u'cat', whole_word=True) == [(0, 3), (4, 7)]
+	assert s.find(u'c.t') == []
+	assert s.find(u'c.t', regex=True) == [(0, 3), (4, 7), (11, 14)]
+	assert s.find(u'') == []
+
+def test_find_skips_empty_matches():
+
+	s = search.search(editor(u'abc'))
+	assert s.find(u'x*', regex=True) == []
+
+def test_invalid_regex():
+
+	s = search.search(editor(u'abc'))
+	with pytest.raises(re.error):
+		s.find(u'(', regex=True)
+
+def test_matches_follow_edits():
+
+	e = editor(u'one two')
+	s = search.search(e)
+	assert s.find(u'two') == [(4, 7)]
+	e.edit(u'two one two')
+	assert s.find(u'two') == [(0, 3), (8, 11)]
+
+def test_replacements():
+
+	s = search.search(editor(u'a1 b2'))
+	assert s.replacements(u'1', u'x') == [(1, 2, u'x')]
+	assert s.replacements(ur'(\w)(\d)', ur'\2\1', regex=True) == \
+		[(0, 2, u'1a'), (3, 5, u'2b')]
+
+def test_index_wraps_around():
+
+	s = search.search(editor(u'x x x'))
+	s.find(u'x')
+	assert s.index(0) == 0
+	assert s.index(1) == 1
+	assert s.index(5) == 0
+
+def test_visible():
+
+	s = search.search(editor(u'aaaa bbbb aaaa'))
+	s.find(u'aaaa')
+	assert s.visible(2, 6) == [(0, 4)]
+	assert s.visible(5, 9) == []
+	assert s.visible(0, 14) == [(0, 4), (10, 14)]
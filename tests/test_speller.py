@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import types
+from PyQt4 import QtCore
+from libquiedit import speller
+
+class HunSpell(object):
+
+	"""Mimics pyhunspell, with a dictionary of a few words."""
+
+	words = [b'the', b'cat', b'sat', b'mat', b'dog']
+	calls = 0
+
+	def __init__(self, dic, aff):
+
+		pass
+
+	def spell(self, word):
+
+		HunSpell.calls += 1
+		return word in self.words
+
+	def get_dic_encoding(self):
+
+		return u'UTF-8'
+
+class window(QtCore.QObject):
+
+	"""Mimics the part of qtquiedit that the speller uses."""
+
+	hunspell_dict = u'en_US'
+	speller_cache_size = 3
+	debug = False
+
+	def __init__(self, folder):
+
+		super(window, self).__init__()
+		self.folder = folder
+		self.hunspell_path = folder
+		self.speller_ignore = []
+
+	def user_folder(self):
+
+		return self.folder
+
+def loaded_speller(tmpdir, monkeypatch):
+
+	hunspell = types.ModuleType('hunspell')
+	hunspell.HunSpell = HunSpell
+	monkeypatch.setitem(sys.modules, 'hunspell', hunspell)
+	for ext in u'dic', u'aff':
+		tmpdir.join(u'en_US.%s' % ext).write(b'')
+	s = speller.speller(window(str(tmpdir)))
+	# There is no event loop to deliver the finished signal of the loader
+	s.wait()
+	s.loaded()
+	return s
+
+def test_cache_evicts_least_recently_used(tmpdir, monkeypatch):
+
+	s = loaded_speller(tmpdir, monkeypatch)
+	for word in u'the', u'cat', u'sat', u'the', u'mat':
+		assert s.check(word)
+	# 'cat' was used least recently when 'mat' was added
+	assert list(s.cache) == [(u'en_US', u'sat'), (u'en_US', u'the'), \
+		(u'en_US', u'mat')]
+
+def test_cache_counters(tmpdir, monkeypatch):
+
+	s = loaded_speller(tmpdir, monkeypatch)
+	HunSpell.calls = 0
+	for word in u'the', u'cat', u'the', u'the', u'dgo':
+		s.check(word)
+	assert s.cache_info() == (2, 3, 3)
+	assert HunSpell.calls == 3
+
+def test_clear_cache_after_ignoring_word(tmpdir, monkeypatch):
+
+	s = loaded_speller(tmpdir, monkeypatch)
+	assert not s.check(u'quiedit')
+	# This is what quieditor.ignore_current_word() does
+	s.quiedit.speller_ignore.append(u'quiedit')
+	assert not s.check(u'quiedit')
+	s.clear_cache()
+	assert s.check(u'quiedit')
+	assert s.check(u'Quiedit')
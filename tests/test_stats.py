@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from libquiedit import stats
+
+class signal(object):
+
+	def connect(self, slot):
+
+		pass
+
+class block(object):
+
+	"""Mimics the part of QTextBlock that stats uses."""
+
+	def __init__(self, document, number):
+
+		self.document = document
+		self.number = number
+
+	def isValid(self):
+
+		return 0 <= self.number < self.document.blockCount()
+
+	def blockNumber(self):
+
+		return self.number if self.isValid() else -1
+
+	def text(self):
+
+		return self.document.lines[self.number]
+
+	def next(self):
+
+		return block(self.document, self.number + 1)
+
+class document(object):
+
+	"""Mimics the part of QTextDocument that stats uses."""
+
+	def __init__(self, text):
+
+		self.lines = text.split(u'\n')
+		self.contentsChange = signal()
+
+	def blockCount(self):
+
+		return len(self.lines)
+
+	def findBlockByNumber(self, number):
+
+		return block(self, number)
+
+	def findBlock(self, pos):
+
+		start = 0
+		for number, line in enumerate(self.lines):
+			start += len(line) + 1
+			if pos < start:
+				return block(self, number)
+		return block(self, -1)
+
+	def edit(self, pos, removed, added):
+
+		text = u'\n'.join(self.lines)
+		self.lines = (text[:pos] + added + text[pos + removed:]).split(u'\n')
+
+class reader(object):
+
+	reading_speed = 250
+
+class editor(object):
+
+	quiedit = reader()
+
+	def __init__(self, text):
+
+		self._document = document(text)
+
+	def document(self):
+
+		return self._document
+
+text = u'# One\n\nSome words here\n\n# Two\nMore words\n## Three\nEnd'
+
+def test_counts():
+
+	s = stats.stats(editor(text))
+	assert s.word_count == 12
+	assert s.line_count() == 8
+	assert s.character_count() == len(text)
+
+def test_update_matches_recount():
+
+	edits = [(0, 0, u'Start '), (7, 4, u''), (8, 0, u'new\nlines\nhere'), \
+		(len(text) - 3, 3, u'# Four'), (0, len(text), u'x')]
+	for pos, removed, added in edits:
+		e = editor(text)
+		s = stats.stats(e)
+		e.document().edit(pos, removed, added)
+		s.update(pos, removed, len(added))
+		fresh = stats.stats(e)
+		assert (s.words, s.chars, s.headers) == (fresh.words, fresh.chars, \
+			fresh.headers)
+		assert (s.word_count, s.char_count) == (fresh.word_count, \
+			fresh.char_count)
+
+def test_section_words():
+
+	s = stats.stats(editor(text))
+	assert s.section_words(2) == 5
+	assert s.section_words(5) == 4
+	assert s.section_words(7) == 3
+
+def test_summary():
+
+	s = stats.stats(editor(text))
+	assert s.summary() == u'12 words, 8 lines and %d characters, 0 min read' \
+		% len(text)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file is part of quiedit.
+
+quiedit is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+quiedit is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with quiedit.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+from libquiedit import verdict_store
+
+def dictionary(tmpdir, content=b'words'):
+
+	dic = str(tmpdir.join(u'en_US.dic'))
+	aff = str(tmpdir.join(u'en_US.aff'))
+	for path in dic, aff:
+		with open(path, u'wb') as f:
+			f.write(content)
+	return dic, aff
+
+def store(tmpdir, dic, aff):
+
+	return verdict_store.verdict_store(str(tmpdir.join(u'verdicts.db')), \
+		u'en_US', dic, aff)
+
+def test_verdicts_persist(tmpdir):
+
+	dic, aff = dictionary(tmpdir)
+	s = store(tmpdir, dic, aff)
+	s.load()
+	s.add(u'word', True)
+	s.add(u'wrod', False)
+	s.write(s.take_pending())
+	assert s.take_pending() == {}
+	s = store(tmpdir, dic, aff)
+	s.load()
+	assert s.verdicts == {u'word': True, u'wrod': False}
+
+def test_changed_dictionary_forgets_verdicts(tmpdir):
+
+	dic, aff = dictionary(tmpdir)
+	s = store(tmpdir, dic, aff)
+	s.load()
+	s.add(u'word', True)
+	s.write(s.take_pending())
+	dic, aff = dictionary(tmpdir, b'other words')
+	s = store(tmpdir, dic, aff)
+	s.load()
+	assert s.verdicts == {}
+
+def test_missing_dictionary_is_not_stored(tmpdir):
+
+	s = store(tmpdir, str(tmpdir.join(u'missing.dic')), \
+		str(tmpdir.join(u'missing.aff')))
+	s.load()
+	assert s.fingerprint == None
+	s.add(u'word', True)
+	s.write(s.take_pending())
+	assert not os.path.exists(str(tmpdir.join(u'verdicts.db')))